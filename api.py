@@ -0,0 +1,331 @@
+import codecs
+import io
+import json
+import re
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator
+from urllib.parse import urljoin, urlsplit
+
+import requests
+from urllib3 import encode_multipart_formdata
+
+import metrics
+
+API_URL = 'http://192.168.1.9/api/'
+# Patron pictures are only ever shown on a button this size
+AVATAR_SIZE = 150, 150
+AVATAR_QUALITY = 85
+WRITE_METHODS = {'POST', 'PUT', 'PATCH', 'DELETE'}
+# Writes to a resource that already exists, these go out one at a time. Creates (POST to a collection) don't conflict
+# with each other and go out side by side
+QUEUED_METHODS = {'PUT', 'PATCH', 'DELETE'}
+# Only reads are shared between identical requests, two identical writes are still two writes
+COALESCED_METHODS = {'GET'}
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+STREAM_CHUNK_SIZE = 64 * 1024
+# A number, true, false or null at the top level of a streamed array, it runs up to the next delimiter
+SCALAR = re.compile(r'[^\s,\]]*')
+# (connect, read) seconds, so a dead server isn't left to the OS connect timeout
+DEFAULT_TIMEOUT = 3.05, 30
+PING_TIMEOUT = 2
+FAILURE_THRESHOLD = 3
+RESET_TIMEOUT = 15
+
+
+class CircuitOpen(requests.ConnectionError):
+    """Raised instead of sending a request while the backend is known to be down"""
+
+
+# Opens after a run of failed requests and fails fast until the server answers again. Once the reset timeout passes
+# one request at a time is let through to try it
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = FAILURE_THRESHOLD, reset_timeout: float = RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: float | None = None
+        self.lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def allow(self) -> bool:
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold and self.opened_at is None:
+                self.opened_at = time.monotonic()
+
+
+# One key per logical write, passed in the Idempotency-Key header of every attempt at it (retries, rebases onto a newer
+# version) so the server can tell a repeat from a new write
+def new_idempotency_key() -> str:
+    return uuid.uuid4().hex
+
+
+# Writes to the same resource go out one at a time, in the order they were made
+class WriteQueue:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.queues: dict[str, deque[threading.Event]] = defaultdict(deque)
+
+    @contextmanager
+    def turn(self, resource: str):
+        ticket = threading.Event()
+        with self.lock:
+            queue = self.queues[resource]
+            queue.append(ticket)
+            if len(queue) == 1:
+                ticket.set()
+
+        ticket.wait()
+        try:
+            yield
+        finally:
+            with self.lock:
+                queue.popleft()
+                if queue:
+                    queue[0].set()
+                else:
+                    del self.queues[resource]
+
+
+# Session that never sends the same read twice at once: identical in-flight GETs share one response, writes to the
+# same existing resource are queued and go out one at a time, and every write carries an idempotency key. Requests
+# fail fast with CircuitOpen while the breaker is open
+class ApiSession(requests.Session):
+    def __init__(self):
+        super().__init__()
+        self.breaker = CircuitBreaker()
+        self.in_flight: dict[tuple, Future] = {}
+        self.in_flight_lock = threading.Lock()
+        self.write_queue = WriteQueue()
+
+    @staticmethod
+    def request_key(method: str, url: str, kwargs: dict) -> tuple | None:
+        # Streamed responses can only be read once and file bodies can't be compared, so those are never shared
+        if method not in COALESCED_METHODS or kwargs.get('stream') or kwargs.get('files'):
+            return None
+
+        data = kwargs.get('data')
+        if not isinstance(data, (str, bytes, dict, type(None))):
+            return None
+        try:
+            body = json.dumps([data if not isinstance(data, bytes) else data.decode('latin-1'), kwargs.get('json'),
+                               kwargs.get('params'), kwargs.get('headers')], sort_keys=True)
+        except (TypeError, ValueError):
+            return None
+        return method, url, body
+
+    def request(self, method, url, *args, **kwargs):
+        method = method.upper()
+        key = self.request_key(method, url, kwargs) if not args else None
+        if key is None:
+            return self.send_request(method, url, *args, **kwargs)
+
+        with self.in_flight_lock:
+            future = self.in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = self.in_flight[key] = Future()
+
+        if not owner:
+            metrics.increment('api.coalesced')
+            return future.result()
+
+        try:
+            response = self.send_request(method, url, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(response)
+            return response
+        finally:
+            with self.in_flight_lock:
+                del self.in_flight[key]
+
+    def send_request(self, method, url, *args, **kwargs):
+        if not self.breaker.allow():
+            raise CircuitOpen(f'Backend unavailable, not sending {method} {url}')
+
+        if method not in WRITE_METHODS:
+            return self.send_checked(method, url, *args, **kwargs)
+
+        # Writes made without a key of their own are a single attempt, they get a fresh one
+        kwargs['headers'] = {IDEMPOTENCY_HEADER: new_idempotency_key(), **(kwargs.get('headers') or {})}
+        if method not in QUEUED_METHODS:
+            return self.send_checked(method, url, *args, **kwargs)
+        with self.write_queue.turn(urlsplit(url).path.rstrip('/')):
+            return self.send_checked(method, url, *args, **kwargs)
+
+    # Feeds the breaker, server errors count as failures as much as not getting through at all
+    def send_checked(self, method, url, *args, **kwargs):
+        kwargs.setdefault('timeout', DEFAULT_TIMEOUT)
+        try:
+            response = super().request(method, url, *args, **kwargs)
+        except (requests.ConnectionError, requests.Timeout):
+            self.breaker.record_failure()
+            raise
+
+        if response.status_code >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return response
+
+    # Health check that goes out even while the breaker is open, returns whether the server answered
+    def ping(self, url: str) -> bool:
+        try:
+            self.send_checked('GET', url, timeout=PING_TIMEOUT)
+        except requests.RequestException:
+            return False
+        return not self.breaker.is_open
+
+
+# Follows the nesting of a JSON object, array or string fed to it piece by piece, looking at every character once, to
+# tell where it ends without decoding it
+class ValueScanner:
+    TOKEN = re.compile(r'["\\{}\[\]]')
+
+    def __init__(self):
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+
+    # Index just past the end of the value in text, or None if it carries on past the end of text
+    def feed(self, text: str, start: int = 0) -> int | None:
+        position = start
+        if self.escaped and position < len(text):
+            self.escaped = False
+            position += 1
+
+        while (match := self.TOKEN.search(text, position)) is not None:
+            token, position = match.group(), match.end()
+            if self.in_string:
+                if token == '\\':
+                    if position == len(text):
+                        self.escaped = True
+                        return None
+                    position += 1
+                elif token == '"':
+                    self.in_string = False
+                    if self.depth == 0:
+                        return position
+            elif token == '"':
+                self.in_string = True
+            elif token in '{[':
+                self.depth += 1
+            else:
+                self.depth -= 1
+                if self.depth == 0:
+                    return position
+        return None
+
+
+# Elements of a top level JSON array as they arrive, only one element is ever held in memory. The response has to be
+# requested with stream=True, requests takes care of gzip. An element cut off at the end of a chunk is kept in pieces
+# and scanned as the rest arrives, so it is only joined and decoded once it is complete
+def iter_json_array(response: requests.Response, chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[Any]:
+    decoder = json.JSONDecoder()
+    text = codecs.getincrementaldecoder(response.encoding or 'utf-8')()
+    whitespace = json.decoder.WHITESPACE.match
+    buffer, position, started = '', 0, False
+    pending: list[str] = []
+    scanner: ValueScanner | None = None
+
+    for chunk in response.iter_content(chunk_size):
+        piece = text.decode(chunk)
+        if scanner is not None:
+            if scanner.feed(piece) is None:
+                pending.append(piece)
+                continue
+            # Complete, it's decoded from the start below along with whatever follows it
+            buffer, position, pending, scanner = ''.join(pending) + piece, 0, [], None
+        else:
+            buffer, position = buffer[position:] + piece, 0
+
+        while True:
+            position = whitespace(buffer, position).end()
+            if position == len(buffer):
+                break
+            if not started:
+                if buffer[position] != '[':
+                    raise ValueError('Expected a JSON array')
+                position, started = position + 1, True
+                continue
+            if buffer[position] == ',':
+                position += 1
+                continue
+            if buffer[position] == ']':
+                return
+
+            if buffer[position] in '{["':
+                element_scanner = ValueScanner()
+                if element_scanner.feed(buffer, position) is None:
+                    pending, scanner = [buffer[position:]], element_scanner
+                    buffer, position = '', 0
+                    break
+            # Numbers and literals are only complete once something follows them
+            elif SCALAR.match(buffer, position).end() == len(buffer):
+                break
+
+            element, position = decoder.raw_decode(buffer, position)
+            yield element
+
+    raise ValueError('Truncated JSON array')
+
+
+# Shrinks a picture to the size it is displayed at and re-encodes it as a small JPEG
+def prepare_photo(path: str, size: tuple[int, int] = AVATAR_SIZE) -> bytes:
+    from PIL import Image, ImageOps
+
+    with Image.open(path) as image:
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail(size, Image.Resampling.LANCZOS)
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+
+        buffer = io.BytesIO()
+        image.save(buffer, 'JPEG', quality=AVATAR_QUALITY, optimize=True)
+    return buffer.getvalue()
+
+
+# Request body that reports how much of it has been sent, requests streams file-like bodies in blocks
+class ProgressReader(io.BytesIO):
+    def __init__(self, data: bytes, progress: Callable[[int, int], None]):
+        super().__init__(data)
+        self.progress = progress
+        self.size = len(data)
+
+    def read(self, size: int | None = -1) -> bytes:
+        chunk = super().read(size)
+        self.progress(self.tell(), self.size)
+        return chunk
+
+
+def upload_photo(session: requests.Session, api_url: str, patron_id: int, photo: bytes,
+                 progress: Callable[[int, int], None] | None = None) -> requests.Response:
+    body, content_type = encode_multipart_formdata({'photo': ('photo.jpg', photo, 'image/jpeg')})
+    data = ProgressReader(body, progress) if progress else body
+    url = urljoin(api_url, f'patrons/{patron_id}')
+    return session.post(url, data=data, headers={'Content-Type': content_type})
@@ -0,0 +1,67 @@
+import json
+import logging
+import time
+
+from PyQt6.QtCore import QObject, QEvent, Qt, pyqtSignal
+from PyQt6.QtGui import QWindow
+from PyQt6.QtWidgets import QApplication
+
+from utilities import data_path
+
+BADGES_FILE = 'badges.json'
+# Badge and NFC readers "type" their code far faster than anyone can, then press Enter
+BADGE_KEY_INTERVAL = 0.05
+MIN_BADGE_LENGTH = 4
+
+logger = logging.getLogger(__name__)
+
+
+def load_badges() -> dict[str, int]:
+    path = data_path(BADGES_FILE)
+    if not path.exists():
+        return {}
+    try:
+        return json.loads(path.read_text())
+    except ValueError:
+        logger.warning('Ignoring unreadable badge file %s', path)
+        return {}
+
+
+def save_badges(badges: dict[str, int]):
+    path = data_path(BADGES_FILE)
+    temp_path = path.with_suffix('.tmp')
+    temp_path.write_text(json.dumps(badges))
+    temp_path.replace(path)
+
+
+# Picks keyboard wedge badge scans out of the key events going to any window. A scan is a burst of characters with
+# no gap longer than BADGE_KEY_INTERVAL, ended by Enter. The Enter is swallowed, whatever typed the characters into a
+# focused text field has to clear them
+class BadgeReader(QObject):
+    badge_scanned = pyqtSignal(str)
+
+    def __init__(self, parent: QObject):
+        super().__init__(parent)
+        self.buffer = ''
+        self.last_key = 0.0
+        QApplication.instance().installEventFilter(self)
+
+    def eventFilter(self, watched: QObject, event: QEvent) -> bool:
+        # Every key press reaches its window first, only look at it there so it's seen once
+        if event.type() != QEvent.Type.KeyPress or not isinstance(watched, QWindow):
+            return False
+
+        now = time.monotonic()
+        if now - self.last_key > BADGE_KEY_INTERVAL:
+            self.buffer = ''
+        self.last_key = now
+
+        if event.key() in (Qt.Key.Key_Return, Qt.Key.Key_Enter):
+            badge, self.buffer = self.buffer, ''
+            if len(badge) >= MIN_BADGE_LENGTH:
+                self.badge_scanned.emit(badge)
+                return True
+            return False
+
+        self.buffer += event.text()
+        return False
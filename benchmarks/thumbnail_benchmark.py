@@ -0,0 +1,131 @@
+"""Drink photo decode benchmark: decode_thumbnail against the full resolution ImageQt path it replaced.
+
+    python benchmarks/thumbnail_benchmark.py
+
+The JPEG fixtures are generated on first run from a fixed seed into benchmarks/fixtures (camera sized pictures are too
+big to keep in git), so every run decodes the same bytes. Each decode runs in a fresh process so peak RSS growth is
+measured for that decode alone. RSS is read with the resource module, so memory is only reported on Linux and macOS.
+"""
+import argparse
+import random
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+FIXTURES = Path(__file__).resolve().parent / 'fixtures'
+# (name, width, height), roughly what 12 and 24 megapixel phone and camera pictures come out at
+FIXTURE_SIZES = [('12mp', 4032, 3024), ('24mp', 6000, 4000)]
+FIXTURE_SEED = 42
+FIXTURE_QUALITY = 92
+RUNS = 5
+# main_window.DRINK_TILE_SIZE, not imported from there since loading the whole GUI would dwarf the decode's memory
+TILE_SIZE = 354, 284
+
+
+# Smooth gradients with blotches and fine noise on top, which compresses about as well as a real photo does
+def make_fixture(path: Path, width: int, height: int):
+    from PIL import Image, ImageDraw, ImageFilter
+
+    rng = random.Random(FIXTURE_SEED)
+    image = Image.linear_gradient('L').resize((width, height)).convert('RGB')
+    draw = ImageDraw.Draw(image)
+    for _ in range(200):
+        x, y, r = rng.randrange(width), rng.randrange(height), rng.randrange(20, width // 6)
+        draw.ellipse((x - r, y - r, x + r, y + r), fill=tuple(rng.randrange(256) for _ in range(3)))
+    image = image.filter(ImageFilter.GaussianBlur(8))
+
+    noise = Image.frombytes('L', (width, height), rng.randbytes(width * height)).convert('RGB')
+    Image.blend(image, noise, 0.08).save(path, 'JPEG', quality=FIXTURE_QUALITY)
+
+
+def fixtures() -> list[Path]:
+    FIXTURES.mkdir(exist_ok=True)
+    paths = []
+    for name, width, height in FIXTURE_SIZES:
+        path = FIXTURES / f'{name}.jpg'
+        if not path.exists():
+            print(f'Generating {path.name} ({width}x{height})...', file=sys.stderr)
+            make_fixture(path, width, height)
+        paths.append(path)
+    return paths
+
+
+def decode_imageqt(path: Path, bounds: tuple[int, int]):
+    from PIL import Image
+    from PIL.ImageQt import ImageQt
+    from PyQt6.QtCore import Qt
+
+    with path.open('rb') as source:
+        return ImageQt(Image.open(source)).scaled(*bounds, Qt.AspectRatioMode.KeepAspectRatio,
+                                                  Qt.TransformationMode.SmoothTransformation)
+
+
+def decode_draft(path: Path, bounds: tuple[int, int]):
+    from thumbnail import decode_thumbnail
+
+    with path.open('rb') as source:
+        return decode_thumbnail(source, bounds)
+
+
+DECODERS = {'imageqt': decode_imageqt, 'draft': decode_draft}
+
+
+def max_rss_mb() -> float | None:
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, kilobytes everywhere else
+    return rss / 2 ** 20 if sys.platform == 'darwin' else rss / 2 ** 10
+
+
+# Runs in the child process: one decode, prints seconds and peak RSS growth in MB
+def measure(decoder: str, path: Path):
+    # Load everything either decoder needs up front, so only the decode itself is measured
+    from PIL import Image, ImageQt  # noqa: F401
+    from PyQt6 import QtGui  # noqa: F401
+    import thumbnail  # noqa: F401
+    Image.init()
+
+    before = max_rss_mb()
+    start = time.perf_counter()
+    DECODERS[decoder](path, TILE_SIZE)
+    elapsed = time.perf_counter() - start
+    after = max_rss_mb()
+    print(elapsed, 'nan' if before is None else after - before)
+
+
+def run(decoder: str, path: Path) -> tuple[float, float]:
+    output = subprocess.run([sys.executable, __file__, '--measure', decoder, str(path)], check=True,
+                            capture_output=True, text=True, cwd=ROOT).stdout
+    elapsed, rss = output.split()
+    return float(elapsed), float(rss)
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=RUNS)
+    parser.add_argument('--measure', nargs=2, metavar=('DECODER', 'PATH'), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.measure:
+        measure(args.measure[0], Path(args.measure[1]))
+        return
+
+    print(f'{"fixture":<10}{"decoder":<10}{"median ms":>12}{"peak RSS +MB":>15}')
+    for path in fixtures():
+        for decoder in DECODERS:
+            results = [run(decoder, path) for _ in range(args.runs)]
+            elapsed = statistics.median(r[0] for r in results) * 1000
+            rss = statistics.median(r[1] for r in results)
+            print(f'{path.stem:<10}{decoder:<10}{elapsed:>12.0f}{rss:>15.1f}')
+
+
+if __name__ == '__main__':
+    main()
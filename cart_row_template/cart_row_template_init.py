@@ -49,7 +49,7 @@ class Ui_cart_row_template(object):
         font = QtGui.QFont()
         font.setPointSize(12)
         self.increase_quantity_button.setFont(font)
-        self.increase_quantity_button.setStyleSheet("padding: 10px 15px")
+        self.increase_quantity_button.setProperty("buttonRole", "quantity")
         self.increase_quantity_button.setObjectName("increase_quantity_button")
         self.horizontalLayout_3.addWidget(self.increase_quantity_button)
         spacerItem1 = QtWidgets.QSpacerItem(40, 20, QtWidgets.QSizePolicy.Policy.Expanding, QtWidgets.QSizePolicy.Policy.Minimum)
@@ -76,7 +76,7 @@ class Ui_cart_row_template(object):
         font = QtGui.QFont()
         font.setPointSize(12)
         self.decrease_quantity_button.setFont(font)
-        self.decrease_quantity_button.setStyleSheet("padding: 10px 15px")
+        self.decrease_quantity_button.setProperty("buttonRole", "quantity")
         self.decrease_quantity_button.setObjectName("decrease_quantity_button")
         self.horizontalLayout_4.addWidget(self.decrease_quantity_button)
         spacerItem3 = QtWidgets.QSpacerItem(40, 20, QtWidgets.QSizePolicy.Policy.Expanding, QtWidgets.QSizePolicy.Policy.Minimum)
@@ -98,7 +98,7 @@ class Ui_cart_row_template(object):
         font = QtGui.QFont()
         font.setPointSize(16)
         self.remove_button.setFont(font)
-        self.remove_button.setStyleSheet("padding: 10px 20px")
+        self.remove_button.setProperty("buttonRole", "remove")
         self.remove_button.setObjectName("remove_button")
         self.horizontalLayout_2.addWidget(self.remove_button)
         spacerItem5 = QtWidgets.QSpacerItem(40, 20, QtWidgets.QSizePolicy.Policy.Expanding, QtWidgets.QSizePolicy.Policy.Minimum)
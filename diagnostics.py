@@ -0,0 +1,64 @@
+import logging
+import tracemalloc
+from collections import Counter
+
+from PyQt6.QtCore import QObject, QTimer
+from PyQt6.QtGui import QKeySequence, QShortcut
+from PyQt6.QtWidgets import QApplication, QWidget
+
+# Set to True to start tracing at launch and log a report every MEMORY_REPORT_INTERVAL ms
+MEMORY_DIAGNOSTICS = False
+MEMORY_REPORT_INTERVAL = 10 * 60 * 1000
+MEMORY_REPORT_HOTKEY = 'Ctrl+Shift+M'
+TOP_ALLOCATIONS = 10
+TOP_QOBJECT_CLASSES = 15
+
+logger = logging.getLogger(__name__)
+
+
+# Counts live QObjects per class across every top level widget (including orphaned ones)
+def count_qobjects() -> Counter:
+    counts = Counter()
+    for widget in QApplication.topLevelWidgets():
+        counts[type(widget).__name__] += 1
+        for child in widget.findChildren(QObject):
+            counts[type(child).__name__] += 1
+    return counts
+
+
+# Tracemalloc snapshots plus QObject counts, diffed against the previous report to spot what keeps growing
+class MemoryDiagnostics:
+    def __init__(self, window: QWidget):
+        self.previous_snapshot: tracemalloc.Snapshot | None = None
+        self.previous_counts = Counter()
+
+        self.shortcut = QShortcut(QKeySequence(MEMORY_REPORT_HOTKEY), window)
+        self.shortcut.activated.connect(self.report)
+
+        self.timer = QTimer(window)
+        self.timer.timeout.connect(self.report)
+
+        if MEMORY_DIAGNOSTICS:
+            tracemalloc.start()
+            self.timer.start(MEMORY_REPORT_INTERVAL)
+
+    def report(self):
+        if not tracemalloc.is_tracing():
+            # First hotkey press only starts tracing, the next one has something to compare against
+            tracemalloc.start()
+            logger.info('Memory tracing started')
+            return
+
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        logger.info('Traced memory: %.1f MiB (peak %.1f MiB)', current / 2 ** 20, peak / 2 ** 20)
+
+        if self.previous_snapshot is not None:
+            for stat in snapshot.compare_to(self.previous_snapshot, 'lineno')[:TOP_ALLOCATIONS]:
+                logger.info('  %s', stat)
+        self.previous_snapshot = snapshot
+
+        counts = count_qobjects()
+        for name, count in counts.most_common(TOP_QOBJECT_CLASSES):
+            logger.info('  %-24s %6d (%+d)', name, count, count - self.previous_counts[name])
+        self.previous_counts = counts
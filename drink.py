@@ -1,5 +1,6 @@
 from dataclasses import dataclass
-from PIL.ImageQt import ImageQt
+
+from PyQt6.QtGui import QImage
 
 
 @dataclass
@@ -8,6 +9,7 @@ class Drink:
     name: str
     description: str
     price: float
-    photo: ImageQt
+    photo: QImage
     in_stock: bool
     categories: list[str]
+    photo_url: str = ''
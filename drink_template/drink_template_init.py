@@ -38,7 +38,7 @@ class Ui_drink_template(object):
         font = QtGui.QFont()
         font.setPointSize(16)
         self.add_to_cart_button.setFont(font)
-        self.add_to_cart_button.setStyleSheet("padding: 20px")
+        self.add_to_cart_button.setProperty("buttonRole", "add_to_cart")
         self.add_to_cart_button.setObjectName("add_to_cart_button")
         self.verticalLayout.addWidget(self.add_to_cart_button)
 
@@ -0,0 +1,66 @@
+import logging
+import threading
+import time
+from functools import wraps
+
+import requests
+from PyQt6.QtCore import QObject, pyqtSignal
+from PyQt6.QtWidgets import QMessageBox
+
+import metrics
+from api import ApiSession
+
+HEALTH_INTERVAL = 5.0
+STATUS_POLL_INTERVAL = 0.5
+UNREACHABLE_MESSAGE = "The server can't be reached right now, please try again in a moment."
+
+logger = logging.getLogger(__name__)
+
+
+# Pings the API on its own thread and reports when the server goes away or comes back. The breaker is also watched
+# between pings, so failing taps show up straight away
+class HealthMonitor(QObject):
+    status_changed = pyqtSignal(bool)
+
+    def __init__(self, parent: QObject, session: ApiSession, url: str, interval: float = HEALTH_INTERVAL):
+        super().__init__(parent)
+        self.session = session
+        self.url = url
+        self.interval = interval
+        self.healthy = True
+
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name='health-monitor', daemon=True)
+        self.thread.start()
+
+    def run(self):
+        next_ping = 0.0
+        while not self.stopped.wait(STATUS_POLL_INTERVAL):
+            if time.monotonic() >= next_ping:
+                next_ping = time.monotonic() + self.interval
+                healthy = self.session.ping(self.url)
+            else:
+                healthy = not self.session.breaker.is_open
+
+            if healthy != self.healthy:
+                self.healthy = healthy
+                metrics.increment('api.recovered' if healthy else 'api.unreachable')
+                self.status_changed.emit(healthy)
+
+    def stop(self):
+        self.stopped.set()
+
+
+# For GUI handlers: a failed request (or one refused by the open breaker) shows a message instead of taking the
+# handler down with it
+def network_action(func):
+    max_args = metrics.trim_args(func)
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        try:
+            return func(*args[:max_args], **kwargs)
+        except requests.RequestException as e:
+            logger.warning('%s failed: %s', func.__name__, e)
+            QMessageBox(QMessageBox.Icon.Critical, 'Server Unreachable', UNREACHABLE_MESSAGE).exec()
+    return wrapper
@@ -0,0 +1,26 @@
+import hashlib
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from utilities import data_path
+
+CACHE_DIR = 'images'
+
+
+# Images are keyed by their URL, a new picture gets a new URL so entries never need invalidating
+def cache_path(url: str) -> Path:
+    directory = data_path(CACHE_DIR)
+    directory.mkdir(exist_ok=True)
+    return directory / (hashlib.sha1(url.encode()).hexdigest() + Path(urlsplit(url).path).suffix)
+
+
+def load(url: str) -> bytes | None:
+    path = cache_path(url)
+    return path.read_bytes() if path.exists() else None
+
+
+def store(url: str, data: bytes):
+    path = cache_path(url)
+    temp_path = path.with_suffix(path.suffix + '.tmp')
+    temp_path.write_bytes(data)
+    temp_path.replace(path)
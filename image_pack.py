@@ -0,0 +1,193 @@
+import hashlib
+import logging
+import mmap
+import struct
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+
+from PyQt6.QtGui import QImage
+
+from utilities import data_path
+
+# Every save writes the next generation, images.<generation>.pack, and the newest one is used. The current one stays
+# mapped, and on Windows a mapped file can't be replaced or deleted, so older generations are removed when possible
+PACK_PREFIX = 'images.'
+PACK_SUFFIX = '.pack'
+PACK_MAGIC = b'HPPK'
+PACK_VERSION = 1
+# magic, version, entry count
+HEADER = struct.Struct('<4sII')
+# sha1 of the URL, width, height, QImage format, offset of the pixels from the start of the file
+ENTRY = struct.Struct('<20sHHIQ')
+FORMATS = {QImage.Format.Format_RGB32.value, QImage.Format.Format_ARGB32.value}
+
+logger = logging.getLogger(__name__)
+
+# Every thumbnail the GUI shows, already decoded, in one file that is mapped into memory. QImages point straight into
+# the mapping, so nothing is decoded or copied at startup and the pixels are shared with the page cache
+_lock = threading.Lock()
+_write_lock = threading.Lock()
+_mapping: mmap.mmap | None = None
+_index: dict[bytes, tuple[int, int, int, int]] | None = None
+_generation = 0
+# Added this session, not in the mapping yet
+_pending: dict[bytes, QImage] = {}
+# Bumped by every add, the pack only needs writing while the last save is behind it
+_changes = 0
+_saved_changes = 0
+# Everything looked up or added this session, older entries are dropped when the pack is rewritten
+_used: set[bytes] = set()
+
+
+def _key(url: str) -> bytes:
+    return hashlib.sha1(url.encode()).digest()
+
+
+def _pack_path(generation: int) -> Path:
+    return data_path(f'{PACK_PREFIX}{generation}{PACK_SUFFIX}')
+
+
+def _generations() -> list[int]:
+    generations = []
+    for path in data_path('').glob(f'{PACK_PREFIX}*{PACK_SUFFIX}'):
+        generation = path.name.removeprefix(PACK_PREFIX).removesuffix(PACK_SUFFIX)
+        if generation.isdigit():
+            generations.append(int(generation))
+    return sorted(generations)
+
+
+def _open():
+    global _mapping, _index, _generation
+    _index = {}
+    generations = _generations()
+    if not generations:
+        return
+
+    _generation = generations[-1]
+    path = _pack_path(_generation)
+    if path.stat().st_size < HEADER.size:
+        return
+
+    with path.open('rb') as file:
+        _mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    magic, version, count = HEADER.unpack_from(_mapping)
+    if magic != PACK_MAGIC or version != PACK_VERSION:
+        logger.warning('Ignoring image pack %s with version %s', path, version)
+        return
+
+    try:
+        for i in range(count):
+            key, width, height, image_format, offset = ENTRY.unpack_from(_mapping, HEADER.size + i * ENTRY.size)
+            if image_format in FORMATS and offset + width * height * 4 <= len(_mapping):
+                _index[key] = width, height, image_format, offset
+    except struct.error:
+        logger.warning('Ignoring truncated image pack %s', path)
+
+
+def load(url: str) -> QImage | None:
+    key = _key(url)
+    with _lock:
+        if _index is None:
+            _open()
+        _used.add(key)
+
+        if key in _pending:
+            return _pending[key]
+        if key not in _index:
+            return None
+        width, height, image_format, offset = _index[key]
+
+    # The mapping is never closed, so it outlives every image made over it
+    pixels = memoryview(_mapping)[offset:offset + width * height * 4]
+    return QImage(pixels, width, height, width * 4, QImage.Format(image_format))
+
+
+def add(url: str, image: QImage):
+    global _changes
+    image_format = QImage.Format.Format_ARGB32 if image.hasAlphaChannel() else QImage.Format.Format_RGB32
+    with _lock:
+        key = _key(url)
+        _pending[key] = image.convertToFormat(image_format)
+        _used.add(key)
+        _changes += 1
+
+
+# What the next generation of the pack holds: (key, width, height, format, image or pixels in the mapping). Images are
+# shared with the pack rather than copied, so this is cheap to take on the GUI thread
+@dataclass
+class Contents:
+    changes: int
+    entries: list[tuple[bytes, int, int, int, QImage | memoryview]]
+
+
+# Everything used this session, or None if nothing new was added since the last save
+def prepare() -> Contents | None:
+    with _lock:
+        if _changes == _saved_changes:
+            return None
+        if _index is None:
+            _open()
+
+        entries = []
+        for key in _used:
+            if key in _pending:
+                image = _pending[key]
+                entries.append((key, image.width(), image.height(), image.format().value, image))
+            elif key in _index:
+                width, height, image_format, offset = _index[key]
+                entries.append((key, width, height, image_format,
+                                memoryview(_mapping)[offset:offset + width * height * 4]))
+        return Contents(_changes, entries)
+
+
+def _pixels(pixels: QImage | memoryview) -> memoryview:
+    if isinstance(pixels, memoryview):
+        return pixels
+    bits = pixels.constBits()
+    bits.setsize(pixels.sizeInBytes())
+    return memoryview(bits)
+
+
+# Writes the contents as a new generation of the pack. This is the slow part, tens of MB with a full party's pictures,
+# and can run on any thread. A failed write raises OSError and is tried again on the next save
+def write(contents: Contents):
+    global _generation, _saved_changes
+    # One writer at a time, each on its own generation
+    with _write_lock:
+        with _lock:
+            generation = _generation + 1
+
+        entries = contents.entries
+        header = [HEADER.pack(PACK_MAGIC, PACK_VERSION, len(entries))]
+        offset = HEADER.size + len(entries) * ENTRY.size
+        for key, width, height, image_format, _ in entries:
+            header.append(ENTRY.pack(key, width, height, image_format, offset))
+            offset += width * height * 4
+
+        # Write next to the new file and rename, so a crash mid-write never leaves a truncated pack behind
+        path = _pack_path(generation)
+        temp_path = path.with_suffix('.tmp')
+        with temp_path.open('wb') as file:
+            file.writelines(header)
+            file.writelines(_pixels(pixels) for *_, pixels in entries)
+        temp_path.replace(path)
+
+        with _lock:
+            _generation = max(_generation, generation)
+            _saved_changes = max(_saved_changes, contents.changes)
+
+    # The generation that's mapped can't be deleted on Windows, it goes on a later save or the next run
+    for old_generation in _generations():
+        if old_generation < generation:
+            try:
+                _pack_path(old_generation).unlink()
+            except OSError:
+                pass
+
+
+def save():
+    contents = prepare()
+    if contents is not None:
+        write(contents)
@@ -0,0 +1,48 @@
+import time
+
+from PyQt6.QtCore import QObject, QTimer, QEvent, pyqtSignal
+from PyQt6.QtWidgets import QApplication
+
+from prefetch import INPUT_EVENTS
+
+# Seconds without input before the kiosk goes into low power
+LOW_POWER_DELAY = 3 * 60
+
+
+# Puts the kiosk into low power after a while without input and wakes it on the very next input event, which is
+# still delivered as usual. Only a single shot timer runs while the kiosk is in use, and nothing at all while it's in
+# low power
+class LowPowerMonitor(QObject):
+    low_power_changed = pyqtSignal(bool)
+
+    def __init__(self, parent: QObject, delay: float = LOW_POWER_DELAY):
+        super().__init__(parent)
+        self.delay = delay
+        self.last_input = time.monotonic()
+        self.low_power = False
+
+        QApplication.instance().installEventFilter(self)
+
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.check)
+        self.timer.start(round(self.delay * 1000))
+
+    def eventFilter(self, watched: QObject, event: QEvent) -> bool:
+        if event.type() in INPUT_EVENTS:
+            self.last_input = time.monotonic()
+            if self.low_power:
+                self.low_power = False
+                self.timer.start(round(self.delay * 1000))
+                self.low_power_changed.emit(False)
+        return False
+
+    # Input doesn't touch the timer, it's just pushed back by however long ago the last input was
+    def check(self):
+        idle = time.monotonic() - self.last_input
+        if idle < self.delay:
+            self.timer.start(round((self.delay - idle) * 1000) + 1)
+            return
+
+        self.low_power = True
+        self.low_power_changed.emit(True)
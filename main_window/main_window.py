@@ -1,22 +1,19 @@
 import json
+import time
 import warnings
+from concurrent.futures import Future
 from datetime import datetime
 from functools import partial
-from pathlib import Path
 from random import choice
+from typing import Iterator
 from urllib.parse import urljoin
-import tempfile
 
 # 3rd party imports
 import requests
 from PyQt6 import QtCore, QtWidgets, QtGui
-from colorhash import ColorHash
 from PyQt6.QtWidgets import QMainWindow, QInputDialog, QMessageBox, QWidget, QPushButton, QScroller
 from PyQt6.QtGui import QPixmap, QIcon
-from PyQt6.QtCore import Qt, QUrl
-from PyQt6.QtMultimedia import QMediaPlayer, QAudioOutput
-from PIL import Image
-from PIL.ImageQt import ImageQt
+from PyQt6.QtCore import Qt, QUrl, QBuffer, pyqtSignal
 from requests import ConnectTimeout
 
 # Local imports
@@ -24,21 +21,63 @@ from .main_window_init import Ui_main_window
 from drink_template import Ui_drink_template
 from tab_row_template import Ui_tab_row_template
 from cart_row_template import Ui_cart_row_template
-from settle_up_dialog import SettleUpDialog
+from settle_up_dialog import SettleUpDialog, payment_note, render_payment_qr
+import image_cache
+import image_pack
+import api
+from api import API_URL, AVATAR_SIZE, IDEMPOTENCY_HEADER, iter_json_array, new_idempotency_key
+from badge_reader import BadgeReader, load_badges, save_badges
+import metrics
+from diagnostics import MemoryDiagnostics
+from health import UNREACHABLE_MESSAGE, HealthMonitor, network_action
+from low_power import LowPowerMonitor
+from ui_watchdog import EventLoopWatchdog
+from patron_index import PatronIndex
+from popularity import PopularityIndex
+from prefetch import IdleScheduler, PatronRanking
+from report import build_report, iter_orders, to_html
+from scheduler import NetworkScheduler, Priority
+from snapshot import SNAPSHOT_INTERVAL, Snapshot, load_snapshot, save_snapshot
+from store import Store
+from theme import set_patron_color
+from thumbnail import decode_thumbnail
 from utilities import resource_path
+from widget_pool import DEFAULT_POOL_SIZE, WidgetPool
 from patron import Patron
 from drink import Drink
-from order import Order, OrderItem
+from order import Order, OrderItem, merge_order_items
 
-API_URL = 'http://192.168.1.9/api/'
 DRINK_COLUMNS = 4
 PATRON_COLUMNS = 8
 DEFAULT_SPIRAL_SHELLS = 7
-BUTTON_SIZE = 150, 150
+BUTTON_SIZE = AVATAR_SIZE
+DRINK_TILE_SIZE = 354, 284
+REPORT_HOTKEY = 'Ctrl+Shift+R'
+HOT_PATRONS = 8
+HOT_REFRESH_INTERVAL = 60
+PREFETCH_ROW_BUDGET = 80
 DEBUG = False
+MAX_CONFLICT_RETRIES = 3
+PATRON_BATCH = PATRON_COLUMNS * 2
 
 
 class MainWindow(QMainWindow):
+    # Patrons, drinks and sound files fetched by the background sync
+    state_fetched = pyqtSignal(object)
+    # Settlement report html, generated on the scheduler
+    report_ready = pyqtSignal(str)
+    # Background picture uploads: percent sent, then (patron, photo url or None on failure, uploaded bytes)
+    upload_progress = pyqtSignal(int)
+    upload_finished = pyqtSignal(object, object, object)
+    # (patron, photo url, picture bytes) downloaded in the background
+    avatar_fetched = pyqtSignal(object, str, object)
+    # (patron, order, whether the items came from the cart) once they are on the patron's tab
+    order_items_sent = pyqtSignal(object, object, bool)
+    # Id of an item taken off a tab
+    tab_item_deleted = pyqtSignal(int)
+    # (icon, title, text) for a tab write that didn't go through
+    write_failed = pyqtSignal(object, str, str)
+
     def __init__(self):
         super().__init__()
 
@@ -48,23 +87,89 @@ class MainWindow(QMainWindow):
 
         self.settle_up_dialog = SettleUpDialog(self)
 
-        # Sound player
-        self.player = QMediaPlayer()
-        self.output = QAudioOutput()
-        self.player.setAudioOutput(self.output)
-        self.output.setVolume(50)
-        self.sound_files = [f['file'] for f in requests.get(urljoin(API_URL, 'sounds')).json()]
-
-        self.patrons: list[Patron] = []
-        self.cart: OrderItem = []
-        self._active_patron: Patron | None = None
-        self.temp_dir: tempfile.TemporaryDirectory | None = None
+        # Shared connection pool for every API call, timed per endpoint
+        self.session = api.ApiSession()
+        metrics.instrument_session(self.session)
+
+        # Sound player, created on first use so QtMultimedia isn't loaded at startup
+        self.player = None
+        self.output = None
+        self.sound_files: list[str] = []
+
+        self.patron_buttons: dict[int, QPushButton] = {}
+        self.patron_index = PatronIndex()
+        # Patrons currently laid out in the grid, everyone unless the search box filters them
+        self.visible_patron_ids: set[int] = set()
+        self.spiral_cells: list[tuple[int, int]] = []
+        self.spiral_turns = 0
+        # Menu tiles by drink id, rearranged by popularity instead of being rebuilt
+        self.drink_widgets: dict[int, QWidget] = {}
+        self.menu_order: list[int] = []
+        self.popularity = PopularityIndex()
+
+        # Background network work, taps that change a tab go ahead of sync, prefetch and pictures
+        self.scheduler = NetworkScheduler()
+        # Work started on patron button press-down so the tab is ready by the time the button is released
+        self.pending_orders: dict[int, Future] = {}
+        # Patron pictures still downloading, cancelled if the patron goes away or changes picture first
+        self.pending_avatars: dict[int, Future] = {}
+        self.pending_refreshes: dict[int, Future] = {}
+        self.avatar_fetched.connect(self.show_avatar)
+        # Tab writes on their way to the server, a second tap doesn't add the same items or settle the tab again
+        self.pending_order_items: Future | None = None
+        self.pending_settle: Future | None = None
+        self.order_items_sent.connect(self.show_order_items_sent)
+        self.tab_item_deleted.connect(self.popularity.remove_item)
+        self.write_failed.connect(self.show_write_error)
+        # Tab rows rendered ahead of time, on press-down or while idle, keyed by patron id
+        self.prefetched_tabs: dict[int, tuple[Order, list[OrderItem], list[Ui_tab_row_template]]] = {}
+
+        # Keep the tabs of frequently selected patrons fresh and rendered while nobody is using the kiosk
+        self.patron_ranking = PatronRanking()
+        self.refreshed_at: dict[int, float] = {}
+        self.idle_scheduler = IdleScheduler(self, self.idle_prefetch)
+
+        # Recycled cart and tab rows
+        self.cart_row_pool = WidgetPool(Ui_cart_row_template)
+        self.tab_row_pool = WidgetPool(Ui_tab_row_template)
+        # Rows of the tab on screen by item id
+        self.tab_rows: dict[int, Ui_tab_row_template] = {}
+        self.tab_order: Order | None = None
+
+        # Patrons, orders, the cart and the menu, the widgets below follow its change signals
+        self.store = Store(self)
+        self.store.patrons_added.connect(self.patrons_added)
+        self.store.patrons_removed.connect(self.patrons_removed)
+        self.store.patrons_changed.connect(self.patrons_changed)
+        self.store.menu_changed.connect(self.populate_menu)
+        self.store.active_patron_changed.connect(self.active_patron_changed)
+        self.store.order_added.connect(self.order_added)
+        self.store.order_items_added.connect(self.tab_items_added)
+        self.store.order_items_changed.connect(self.tab_items_changed)
+        self.store.order_items_removed.connect(self.tab_items_removed)
+        self.store.order_settled.connect(self.order_settled)
+        self.store.cart_items_added.connect(self.cart_items_added)
+        self.store.cart_items_changed.connect(self.cart_items_changed)
+        self.store.cart_items_removed.connect(self.cart_items_removed)
 
         self.ui.new_patron_button.clicked.connect(self.add_patron)
         self.ui.settle_up_button.clicked.connect(self.settle_up)
         self.ui.back_to_patrons_button.clicked.connect(self.back_to_patrons)
         self.ui.add_to_tab_button.clicked.connect(self.add_to_tab)
         self.ui.clear_cart_button.clicked.connect(self.clear_cart)
+        self.ui.usual_button.clicked.connect(self.order_usual)
+        self.ui.patron_search_edit.textChanged.connect(self.relayout_patrons)
+        self.ui.patron_search_edit.returnPressed.connect(self.select_search_result)
+
+        # Badge and NFC readers that type like a keyboard select a patron straight away
+        self.badges = load_badges()
+        self.badge_patron: Patron | None = None
+        self.badge_prompt: QMessageBox | None = None
+        self.badge_reader = BadgeReader(self)
+        self.badge_reader.badge_scanned.connect(self.badge_scanned)
+
+        # Report GUI thread stalls and kinetic scrolling frame times
+        self.watchdog = EventLoopWatchdog(self)
 
         if not DEBUG:
             # Grab scroll area gesture for single finger scroll
@@ -72,9 +177,231 @@ class MainWindow(QMainWindow):
             QScroller.grabGesture(self.ui.scrollArea_2.viewport(), QScroller.ScrollerGestureType.TouchGesture)
             QScroller.grabGesture(self.ui.scrollArea_3.viewport(), QScroller.ScrollerGestureType.TouchGesture)
 
-        # Load from database
-        self.load_patrons()
-        self.load_drinks()
+            for scroll_area in self.ui.scrollArea, self.ui.scrollArea_2, self.ui.scrollArea_3:
+                self.watchdog.watch_scrolling(scroll_area.viewport())
+
+        # Memory report hotkey for long running sessions
+        self.memory_diagnostics = MemoryDiagnostics(self)
+
+        # Admin page with the settlement report
+        self.report_page = QWidget()
+        report_layout = QtWidgets.QVBoxLayout(self.report_page)
+        self.report_browser = QtWidgets.QTextBrowser()
+        report_layout.addWidget(self.report_browser)
+        report_back_button = QPushButton('Back')
+        report_back_button.clicked.connect(self.back_to_patrons)
+        report_layout.addWidget(report_back_button)
+        self.ui.stacked_widget.addWidget(self.report_page)
+
+        # Reachable by touch from the patron page, the hotkey is only a shortcut for when a keyboard is plugged in
+        self.report_button = QPushButton('Report', parent=self.ui.patron_selection_page)
+        self.report_button.setFont(self.ui.patron_search_edit.font())
+        self.report_button.clicked.connect(self.show_report)
+        self.ui.gridLayout.addWidget(self.report_button, 0, 3)
+
+        self.report_shortcut = QtGui.QShortcut(QtGui.QKeySequence(REPORT_HOTKEY), self)
+        self.report_shortcut.activated.connect(self.show_report)
+        self.report_ready.connect(self.report_browser.setHtml)
+
+        # Still screen for low power, whatever page was showing is kept as it was underneath
+        self.attract_page = QWidget()
+        self.attract_page.setObjectName('attract_page')
+        self.attract_page.setAttribute(Qt.WidgetAttribute.WA_StyledBackground)
+        attract_layout = QtWidgets.QVBoxLayout(self.attract_page)
+        attract_label = QtWidgets.QLabel('Tap anywhere to start')
+        attract_label.setObjectName('attract_label')
+        attract_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        font = attract_label.font()
+        font.setPointSize(36)
+        attract_label.setFont(font)
+        attract_layout.addWidget(attract_label)
+        self.ui.stacked_widget.addWidget(self.attract_page)
+        self.page_before_low_power: QWidget | None = None
+
+        # Between rushes animations, prefetch and the watchdog stop until the next touch
+        self.low_power = LowPowerMonitor(self)
+        self.low_power.low_power_changed.connect(self.set_low_power)
+
+        self.upload_progress_dialog = QtWidgets.QProgressDialog('Uploading picture...', None, 0, 100, self)
+        self.upload_progress_dialog.setWindowModality(Qt.WindowModality.NonModal)
+        self.upload_progress_dialog.reset()
+        self.upload_progress.connect(self.upload_progress_dialog.setValue)
+        self.upload_finished.connect(self.picture_uploaded)
+
+        # Requests fail fast while the server is down, say so on screen and resync once it's back
+        self.health_indicator = QtWidgets.QLabel('Server unreachable', self)
+        self.health_indicator.setProperty('healthStatus', 'offline')
+        self.health_indicator.hide()
+        self.health_monitor = HealthMonitor(self, self.session, API_URL)
+        self.health_monitor.status_changed.connect(self.health_changed)
+
+        # Render the last known state straight away and reconcile with the server in the background, only falling
+        # back to a blocking load from the database when there is nothing to start from
+        self.state_fetched.connect(self.reconcile)
+        snapshot = load_snapshot()
+        if snapshot is not None:
+            self.restore_snapshot(snapshot)
+            self.sync_state()
+        else:
+            self.load_sound_files()
+            self.load_patrons()
+            self.load_drinks()
+
+        # Keep the snapshot fresh in case the kiosk goes down mid-party
+        self.snapshot_timer = QtCore.QTimer(self)
+        self.snapshot_timer.timeout.connect(self.write_snapshot)
+        self.snapshot_timer.start(SNAPSHOT_INTERVAL)
+
+    def closeEvent(self, event):
+        # Nothing is repainted, or sent off to render, once the window is going away
+        self.store.blockSignals(True)
+        self.health_monitor.stop()
+        self.scheduler.shutdown()
+        # Nothing runs on the scheduler any more, so the last save is written right here
+        self.write_snapshot(background=False)
+        super().closeEvent(event)
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.place_health_indicator()
+
+    def place_health_indicator(self):
+        self.health_indicator.adjustSize()
+        self.health_indicator.move(self.width() - self.health_indicator.width() - 10, 10)
+        self.health_indicator.raise_()
+
+    def set_low_power(self, low_power: bool):
+        if low_power:
+            self.page_before_low_power = self.ui.stacked_widget.currentWidget()
+            self.ui.stacked_widget.setCurrentWidget(self.attract_page)
+            self.idle_scheduler.pause()
+            self.watchdog.pause()
+        else:
+            self.ui.stacked_widget.setCurrentWidget(self.page_before_low_power)
+            self.idle_scheduler.resume()
+            self.watchdog.resume()
+
+        # Free the spare rows while nobody is around, the pools fill up again as rows are released after waking
+        pool_size = 0 if low_power else DEFAULT_POOL_SIZE
+        self.cart_row_pool.resize(pool_size)
+        self.tab_row_pool.resize(pool_size)
+
+        # Paused movies keep their current frame, so the buttons look the same the moment the page comes back
+        for patron in self.store.patrons:
+            if patron.movie is not None:
+                patron.movie.setPaused(low_power)
+
+    def health_changed(self, healthy: bool):
+        self.health_indicator.setVisible(not healthy)
+        self.place_health_indicator()
+
+        # Pick up whatever was missed while the server was away
+        if healthy:
+            self.sync_state()
+
+    ####################################################################################################################
+    # State
+    ####################################################################################################################
+
+    # Runs from the snapshot timer and on close, a full disk or a locked file mustn't take either down. The image pack
+    # can be tens of MB, so only what goes in it is gathered here and the file is written on the scheduler
+    def write_snapshot(self, background: bool = True):
+        try:
+            save_snapshot(self.store.patrons, self.store.drinks, self.sound_files)
+        except OSError as e:
+            warnings.warn(f"Writing the snapshot failed: {e}")
+
+        contents = image_pack.prepare()
+        if contents is None:
+            return
+        if background:
+            self.scheduler.submit(self.write_image_pack, contents)
+        else:
+            self.write_image_pack(contents)
+
+    def write_image_pack(self, contents: image_pack.Contents):
+        try:
+            image_pack.write(contents)
+        except OSError as e:
+            warnings.warn(f"Writing the image pack failed: {e}")
+
+    def restore_snapshot(self, snapshot: Snapshot):
+        self.sound_files = snapshot.sound_files
+        self.store.add_patrons(snapshot.patrons)
+        self.store.set_menu(snapshot.drinks)
+
+    def sync_state(self):
+        self.scheduler.submit(self.fetch_state).add_done_callback(self.sync_done)
+
+    # Runs on the scheduler. fetch_state handles network errors itself, anything else would be lost with the future
+    @staticmethod
+    def sync_done(future: Future):
+        if not future.cancelled() and future.exception() is not None:
+            warnings.warn(f"Background sync failed: {future.exception()!r}")
+
+    # Runs on the scheduler, hands the result back to the GUI thread through state_fetched
+    def fetch_state(self):
+        try:
+            state = self.fetch_patrons(), self.fetch_drinks(), self.fetch_sound_files()
+        except requests.RequestException as e:
+            warnings.warn(f"Background sync failed: {e}")
+            return
+        self.state_fetched.emit(state)
+
+    def reconcile(self, state: tuple[list[Patron], list[Drink], list[str]]):
+        patrons, drinks, self.sound_files = state
+        self.reconcile_patrons(patrons)
+        self.store.set_menu(drinks)
+        self.write_snapshot()
+
+    def reconcile_patrons(self, patrons: list[Patron]):
+        current = {patron.id: patron for patron in self.store.patrons}
+        reconciled = []
+        for patron in patrons:
+            existing = current.pop(patron.id, None)
+            if existing is None:
+                reconciled.append(patron)
+                continue
+
+            # Update in place so the button's slots and the active patron stay bound to the same object
+            self.store.update_patron(existing, patron.name, patron.photo)
+            self.store.set_orders(existing, self.merge_orders(existing.orders, patron.orders))
+            existing.balance = patron.balance
+            reconciled.append(existing)
+
+        # Anyone left in current was removed on the server
+        self.store.set_patrons(reconciled)
+        for patron in reconciled:
+            self.count_orders(patron)
+
+    # Server copy wins unless ours is newer, and orders created here after the fetch started are kept
+    @staticmethod
+    def merge_orders(local: list[Order], remote: list[Order]) -> list[Order]:
+        local_by_id = {order.id: order for order in local}
+        merged = []
+        for order in remote:
+            local_order = local_by_id.pop(order.id, None)
+            merged.append(local_order if local_order is not None and local_order.version > order.version else order)
+        return merged + list(local_by_id.values())
+
+    def load_sound_files(self):
+        try:
+            self.sound_files = self.fetch_sound_files()
+        except requests.RequestException as e:
+            warnings.warn(f"Loading sound files failed: {e}")
+
+    def fetch_sound_files(self) -> list[str]:
+        return [f['file'] for f in self.session.get(urljoin(API_URL, 'sounds')).json()]
+
+    # Cached by URL so restarts (and the snapshot) don't download pictures again
+    def fetch_image(self, url: str) -> bytes:
+        data = image_cache.load(url)
+        if data is None:
+            response = self.session.get(url)
+            response.raise_for_status()  # Ensure we got a successful response
+            data = response.content
+            image_cache.store(url, data)
+        return data
 
     ####################################################################################################################
     # Patron
@@ -82,65 +409,196 @@ class MainWindow(QMainWindow):
 
     @property
     def active_patron(self) -> Patron:
-        return self._active_patron
+        return self.store.active_patron
 
-    @active_patron.setter
-    def active_patron(self, patron: Patron):
-        self._active_patron = patron
-        self.clear_cart()
-        self.update_tab()
+    # The tab is rendered by patron_clicked itself, the page can't change before the patron has an order
+    def active_patron_changed(self, patron: Patron | None):
+        if patron is None:
+            # Removed while being served
+            self.tab_order = None
+            self.back_to_patrons()
+
+    def patron_pressed(self, patron: Patron):
+        order = patron.active_order
+        if order is None:
+            # Create the order in the background, update_tab picks it up on release
+            if patron.id not in self.pending_orders:
+                self.pending_orders[patron.id] = self.scheduler.submit(self.post_new_order, patron.name,
+                                                                       priority=Priority.WRITE)
+            return
+
+        # Render the tab rows off-screen, they are only parented once the click is committed
+        self.prefetch_tab(patron)
+
+    # Returns whether any rows had to be built
+    def prefetch_tab(self, patron: Patron) -> bool:
+        order = patron.active_order
+        entry = self.prefetched_tabs.get(patron.id)
+        if entry is not None and self.is_current_tab(entry, order):
+            return False
+
+        self.discard_prefetched_tab(patron.id)
+        self.prefetched_tabs[patron.id] = order, list(order.order_items), [self.build_tab_row(i) for i in
+                                                                           order.order_items]
+        return True
+
+    @staticmethod
+    def is_current_tab(entry: tuple[Order, list[OrderItem], list[Ui_tab_row_template]], order: Order) -> bool:
+        prefetched_order, prefetched_items, _ = entry
+        return (prefetched_order is order and len(prefetched_items) == len(order.order_items)
+                and all(a is b for a, b in zip(prefetched_items, order.order_items)))
+
+    def discard_prefetched_tab(self, patron_id: int):
+        entry = self.prefetched_tabs.pop(patron_id, None)
+        if entry is not None:
+            for tab_row_ui in entry[2]:
+                self.tab_row_pool.release(tab_row_ui)
+
+    # One small piece of work per idle tick: refresh a hot patron's order, or render their tab
+    def idle_prefetch(self):
+        hot = self.patron_ranking.top(HOT_PATRONS)
+        for patron_id in list(self.prefetched_tabs):
+            if patron_id not in hot:
+                self.discard_prefetched_tab(patron_id)
+        for patron_id in list(self.pending_refreshes):
+            if patron_id not in hot or self.pending_refreshes[patron_id].done():
+                self.pending_refreshes.pop(patron_id).cancel()
+
+        patrons = {patron.id: patron for patron in self.store.patrons}
+        now = time.monotonic()
+        for patron_id in hot:
+            patron = patrons.get(patron_id)
+            if patron is None or patron is self.active_patron or patron.active_order is None:
+                continue
+
+            if now - self.refreshed_at.get(patron_id, 0) > HOT_REFRESH_INTERVAL:
+                self.refreshed_at[patron_id] = now
+                self.pending_refreshes[patron_id] = self.scheduler.submit(self.refresh_order, patron,
+                                                                          patron.active_order.id)
+                return
+
+            rows = sum(len(entry[2]) for entry in self.prefetched_tabs.values())
+            if rows + len(patron.active_order.order_items) > PREFETCH_ROW_BUDGET:
+                return
 
+            if self.prefetch_tab(patron):
+                return
+
+    # Runs on the scheduler, the store applies the order on the GUI thread
+    def refresh_order(self, patron: Patron, order_id: int):
+        try:
+            self.store.update_order(patron, self.fetch_order(order_id))
+        except requests.RequestException:
+            pass
+
+    @metrics.action('patron_clicked')
+    @network_action
     def patron_clicked(self, patron: Patron):
-        self.active_patron = patron
+        self.ui.patron_search_edit.clear()
+        self.patron_ranking.record(patron.id)
+        self.store.select_patron(patron)
+        self.update_tab()
+        self.arrange_menu(patron)
+        self.update_usual_button()
         self.ui.stacked_widget.setCurrentIndex(1)
         self.ui.patron_name_label.setText(patron.name)
 
+    @metrics.action('back_to_patrons')
     def back_to_patrons(self):
-        self.ui.stacked_widget.setCurrentIndex(0)
+        # In low power, e.g. the tab was settled on another terminal, the kiosk wakes up to the patrons instead
+        if self.low_power.low_power:
+            self.page_before_low_power = self.ui.stacked_widget.widget(0)
+        else:
+            self.ui.stacked_widget.setCurrentIndex(0)
         self.ui.tab_widget.setCurrentIndex(0)
 
-    # Load in existing patrons from the database
+    # Load in existing patrons from the database, they show up in the grid as they are parsed
     def load_patrons(self):
-        # Fetch patrons
-        url = urljoin(API_URL, 'patrons')
+        self.scheduler.submit(self.stream_patrons, priority=Priority.READ)
+
+    # Runs on the scheduler, patrons are handed to the store a couple of grid rows at a time
+    @metrics.timed('load_patrons')
+    def stream_patrons(self):
+        batch = []
         try:
-            request = requests.get(url)
+            for patron in self.iter_patrons():
+                batch.append(patron)
+                if len(batch) == PATRON_BATCH:
+                    self.store.add_patrons(batch)
+                    batch = []
         except ConnectTimeout:
             warnings.warn("Database connection timed out")
-            return
-
-        for i, patron_json in enumerate(request.json()):
-            # Construct Order objects
-            orders = []
-            for order_json in patron_json['orders']:
-                orders.append(self.create_order(order_json))
-
-            patron_json['orders'] = orders
-            patron = Patron(**patron_json)
-            self.patrons.append(patron)
-
-            self.add_patron_to_gui(patron, i)
+        except (requests.RequestException, ValueError) as e:
+            warnings.warn(f"Loading patrons failed: {e}")
+
+        if batch:
+            self.store.add_patrons(batch)
+
+    # New patrons at the end go straight into their cells, anywhere else everyone after them moves along
+    def patrons_added(self, patrons: list[Patron]):
+        positions = {patron.id: i for i, patron in enumerate(self.store.patrons)}
+        appended = len(self.store.patrons) - len(patrons)
+        for patron in patrons:
+            self.add_patron_to_gui(patron, positions[patron.id])
+            self.count_orders(patron)
+
+        if any(positions[patron.id] < appended for patron in patrons) or self.ui.patron_search_edit.text():
+            self.relayout_patrons()
+
+    def patrons_removed(self, patrons: list[Patron]):
+        for patron in patrons:
+            self.remove_patron_from_gui(patron)
+        self.relayout_patrons()
+
+    # Renamed or given a new picture
+    def patrons_changed(self, patrons: list[Patron]):
+        for patron in patrons:
+            # Removed from the grid since
+            patron_button = self.patron_buttons.get(patron.id)
+            if patron_button is None:
+                continue
+            self.patron_index.update(patron)
+            self.set_patron_icon(patron, patron_button)
+            if patron is self.active_patron:
+                self.ui.patron_name_label.setText(patron.name)
+
+        if self.ui.patron_search_edit.text():
+            self.relayout_patrons()
+
+    def fetch_patrons(self) -> list[Patron]:
+        return list(self.iter_patrons())
+
+    # Patrons are decoded one at a time straight off the (gzipped) response instead of parsing the whole document
+    def iter_patrons(self) -> Iterator[Patron]:
+        url = urljoin(API_URL, 'patrons')
+        with self.session.get(url, stream=True) as response:
+            response.raise_for_status()
+            for patron_json in iter_json_array(response):
+                # Construct Order objects
+                patron_json['orders'] = [self.create_order(order_json) for order_json in patron_json['orders']]
+                yield Patron(**patron_json)
 
     # Add new patron from GUI
+    @network_action
     def add_patron(self):
+        self.ui.patron_search_edit.clear()
         name, ok = QInputDialog().getText(self, 'Add a Patron', "Please enter your full name:")
         if ok:
-            if name in [p.name for p in self.patrons]:
+            if self.patron_index.find(name) is not None:
                 QMessageBox(QMessageBox.Icon.Critical, 'Duplicate Patron Name',
                             'The desired name already exists, please try again.').exec()
                 return
 
             url = urljoin(API_URL, 'patrons')
-            response = requests.post(url, data={'name': name})
+            response = self.session.post(url, data={'name': name})
             patron = Patron(**response.json())
 
-            self.patrons.append(patron)
-
-            self.add_patron_to_gui(patron, len(self.patrons) - 1)
+            self.store.add_patrons([patron])
 
             # Select newly added patron
             self.patron_clicked(patron)
 
+    @metrics.timed('widget.patron_button')
     def add_patron_to_gui(self, patron: Patron, num_patrons: int):
         # Get new user button and move it to next grid cell
         new_x, new_y = self.get_new_patron_grid_cell(num_patrons + 1)
@@ -167,60 +625,137 @@ class MainWindow(QMainWindow):
         # If the user has a picture use that, otherwise use initials and color
         self.set_patron_icon(patron, patron_button)
 
-        # Connect button press to change active user
-        patron_button.clicked.connect(lambda: self.patron_clicked(patron))
+        # Connect button press to change active user, prefetching their tab as soon as the button goes down
+        patron_button.pressed.connect(partial(self.patron_pressed, patron))
+        patron_button.clicked.connect(partial(self.patron_clicked, patron))
 
         # Setup context menu
         patron_button.setContextMenuPolicy(QtCore.Qt.ContextMenuPolicy.CustomContextMenu)
-        patron_button.customContextMenuRequested.connect(lambda: self.patron_button_context_menu(patron, patron_button))
+        patron_button.customContextMenuRequested.connect(partial(self.patron_button_context_menu, patron, patron_button))
 
         # Add new button to gui
         patron_x, patron_y = self.get_new_patron_grid_cell(num_patrons)
         self.ui.patron_selection_layout.addWidget(patron_button, patron_y, patron_x)
+        self.patron_buttons[patron.id] = patron_button
+        self.patron_index.add(patron)
+        self.visible_patron_ids.add(patron.id)
+
+    def remove_patron_from_gui(self, patron: Patron):
+        patron_button = self.patron_buttons.pop(patron.id)
+        self.stop_patron_movie(patron)
+        self.cancel_avatar(patron.id)
+        self.patron_index.remove(patron.id)
+        self.visible_patron_ids.discard(patron.id)
+        self.ui.patron_selection_layout.removeWidget(patron_button)
+        patron_button.deleteLater()
+
+    # Patrons matching the search box, or everyone
+    def visible_patrons(self) -> list[Patron]:
+        query = self.ui.patron_search_edit.text()
+        return self.patron_index.search(query) if query.strip() else self.store.patrons
+
+    # Close the gaps left by removed patrons, or show only the patrons matching the search from the centre out
+    @metrics.timed('relayout_patrons')
+    def relayout_patrons(self):
+        patrons = self.visible_patrons()
+        visible_patron_ids = {patron.id for patron in patrons}
+        for patron_id in self.visible_patron_ids - visible_patron_ids:
+            self.patron_buttons[patron_id].hide()
+        self.visible_patron_ids = visible_patron_ids
+
+        for i, patron in enumerate(patrons):
+            patron_button = self.patron_buttons[patron.id]
+            self.ui.patron_selection_layout.removeWidget(patron_button)
+            patron_x, patron_y = self.get_new_patron_grid_cell(i)
+            self.ui.patron_selection_layout.addWidget(patron_button, patron_y, patron_x)
+            patron_button.show()
+
+        new_x, new_y = self.get_new_patron_grid_cell(len(patrons))
+        self.ui.patron_selection_layout.removeWidget(self.ui.new_patron_button)
+        self.ui.patron_selection_layout.addWidget(self.ui.new_patron_button, new_y, new_x)
 
+    @metrics.timed('set_patron_icon')
     def set_patron_icon(self, patron: Patron, patron_button: QPushButton):
+        # Replacing a picture, stop the old animation and drop any download of the old picture
+        self.stop_patron_movie(patron)
+        self.cancel_avatar(patron.id)
+
+        # Packed pictures show straight away, anything else is downloaded in the background
+        image = image_pack.load(patron.photo) if patron.photo and ".gif" not in patron.photo else None
+        if image is not None:
+            patron_button.setText('')
+            patron_button.setIcon(QIcon(QtGui.QPixmap.fromImage(image)))
+            patron_button.setIconSize(patron_button.size())
+            return
+
         if patron.photo:
-            if ".gif" in patron.photo:
-                # Create temporary directory
-                self.temp_dir = tempfile.TemporaryDirectory(delete=False)
-                gif_file_path = Path(self.temp_dir.name) / "temp.gif"
-
-                # Download the gif file
-                response = requests.get(patron.photo)
-                response.raise_for_status()  # Ensure we got a successful response
-
-                # Write the content of the response to a new file in the temporary directory
-                gif_file_path.write_bytes(response.content)
-
-                patron.movie = QtGui.QMovie()
-                patron.movie.setFileName(str(gif_file_path))
-                patron.movie.setCacheMode(QtGui.QMovie.CacheMode.CacheAll)
-                update_frame = lambda: patron_button.setIcon(QIcon(patron.movie.currentPixmap().scaled(*BUTTON_SIZE, Qt.AspectRatioMode.KeepAspectRatio)))
-                patron.movie.frameChanged.connect(update_frame)
-                patron.movie.start()
-            else:
-                response = requests.get(patron.photo)
-                response.raise_for_status()  # Ensure we got a successful response
+            self.pending_avatars[patron.id] = self.scheduler.submit(self.fetch_avatar, patron, patron.photo)
 
-                image = QtGui.QImage()
-                image.loadFromData(response.content)
-                pixmap = QtGui.QPixmap(image)
-                patron_button.setIcon(QIcon(pixmap))
-            patron_button.setIconSize(patron_button.size())
-        else:
-            # Set button color based on patron name
-            color = ColorHash(patron.name)
-            patron_button.setStyleSheet(f'background-color: {color.hex}; color: #202124')
+        # Set button color based on patron name, this is also the placeholder while a picture downloads
+        set_patron_color(patron_button, patron.name)
+
+        # Extract initials from patron name
+        initials = ''.join([x[0] for x in patron.name.split(' ')]).upper()
+        patron_button.setText(initials)
 
-            # Extract initials from patron name
-            initials = ''.join([x[0] for x in patron.name.split(' ')]).upper()
-            patron_button.setText(initials)
+    def cancel_avatar(self, patron_id: int):
+        future = self.pending_avatars.pop(patron_id, None)
+        if future is not None:
+            future.cancel()
+
+    # Runs on the scheduler, hands the picture back to the GUI thread through avatar_fetched
+    def fetch_avatar(self, patron: Patron, url: str):
+        try:
+            self.avatar_fetched.emit(patron, url, self.fetch_image(url))
+        except requests.RequestException as e:
+            warnings.warn(f"Loading the picture of {patron.name} failed: {e}")
+
+    def show_avatar(self, patron: Patron, url: str, data: bytes):
+        # The patron was removed, or changed picture, while this was downloading
+        patron_button = self.patron_buttons.get(patron.id)
+        if patron_button is None or patron.photo != url:
+            return
+        self.pending_avatars.pop(patron.id, None)
+        patron_button.setText('')
+
+        if ".gif" in url:
+            # Play straight from memory, the buffer and movie are owned by the button and go away with it
+            patron.movie = QtGui.QMovie(patron_button)
+            gif_buffer = QBuffer(patron.movie)
+            gif_buffer.setData(data)
+            patron.movie.setDevice(gif_buffer)
+            patron.movie.setCacheMode(QtGui.QMovie.CacheMode.CacheAll)
+            patron.movie.frameChanged.connect(partial(self.update_patron_frame, patron, patron_button))
+            patron.movie.start()
+            patron.movie.setPaused(self.low_power.low_power)
+        else:
+            image = QtGui.QImage()
+            with metrics.span('image.decode', kind='patron'):
+                image.loadFromData(data)
+            image = image.scaled(*BUTTON_SIZE, Qt.AspectRatioMode.KeepAspectRatio,
+                                 Qt.TransformationMode.SmoothTransformation)
+            image_pack.add(url, image)
+            patron_button.setIcon(QIcon(QtGui.QPixmap.fromImage(image)))
+        patron_button.setIconSize(patron_button.size())
+
+    def update_patron_frame(self, patron: Patron, patron_button: QPushButton):
+        pixmap = patron.movie.currentPixmap().scaled(*BUTTON_SIZE, Qt.AspectRatioMode.KeepAspectRatio)
+        patron_button.setIcon(QIcon(pixmap))
+
+    @staticmethod
+    def stop_patron_movie(patron: Patron):
+        if patron.movie is not None:
+            patron.movie.stop()
+            patron.movie.frameChanged.disconnect()
+            patron.movie.deleteLater()
+            patron.movie = None
 
     def patron_button_context_menu(self, patron, patron_button):
         menu = QtWidgets.QMenu()
         edit_patron_action = menu.addAction('Edit Patron')
         remove_patron_action = menu.addAction('Remove Patron')
         add_picture_action = menu.addAction('Add Picture')
+        assign_badge_action = menu.addAction('Assign Badge')
         res = menu.exec(QtGui.QCursor.pos())
         if res == edit_patron_action:
             self.edit_patron(patron, patron_button)
@@ -229,25 +764,64 @@ class MainWindow(QMainWindow):
             self.remove_patron(patron, patron_button)
         elif res == add_picture_action:
                 self.add_picture(patron, patron_button)
+        elif res == assign_badge_action:
+            self.assign_badge(patron)
 
+    @network_action
     def edit_patron(self, patron, patron_button):
         name, ok = QInputDialog().getText(self, 'Edit Patron', "Please enter the new name:",
                                           text=patron.name)
         if ok and patron.name.lower() != "benchj":
-            if name in [p.name for p in self.patrons]:
+            if self.patron_index.find(name) not in (None, patron):
                 QMessageBox(QMessageBox.Icon.Critical, 'Duplicate Patron Name',
                             'The desired name already exists, please try again.').exec()
                 return
 
             url = urljoin(API_URL, f'patrons/{patron.id}')
-            response = requests.patch(url, data={'name': name})
+            response = self.session.patch(url, data={'name': name})
+
+            self.store.update_patron(patron, name, patron.photo)
+
+    # The next badge scanned is assigned to the patron
+    def assign_badge(self, patron: Patron):
+        self.badge_patron = patron
+        self.badge_prompt = QMessageBox(QMessageBox.Icon.Information, 'Assign Badge',
+                                        f'Scan the badge for {patron.name} now.', QMessageBox.StandardButton.Cancel,
+                                        self)
+        self.badge_prompt.rejected.connect(self.cancel_badge_assignment)
+        self.badge_prompt.open()
+
+    def cancel_badge_assignment(self):
+        self.badge_patron = None
+
+    def badge_scanned(self, badge: str):
+        # The reader typed the code into the search box if it had focus
+        search_text = self.ui.patron_search_edit.text()
+        if search_text.endswith(badge):
+            self.ui.patron_search_edit.setText(search_text.removesuffix(badge))
+
+        if self.badge_patron is not None:
+            self.badges[badge] = self.badge_patron.id
+            save_badges(self.badges)
+            self.badge_patron = None
+            self.badge_prompt.accept()
+            return
 
-            patron.name = name
+        patron = self.patron_index.get(self.badges.get(badge))
+        if patron is None:
+            QMessageBox(QMessageBox.Icon.Warning, 'Unknown Badge',
+                        "This badge isn't assigned to anyone yet, assign it from the patron's menu.").exec()
+            return
 
-            # Extract initials from patron name
-            initials = ''.join([x[0] for x in patron.name.split(' ')]).upper()
-            patron_button.setText(initials)
+        self.back_to_patrons()
+        self.patron_clicked(patron)
 
+    def select_search_result(self):
+        patrons = self.visible_patrons()
+        if self.ui.patron_search_edit.text().strip() and patrons:
+            self.patron_clicked(patrons[0])
+
+    @network_action
     def remove_patron(self, patron, patron_button):
         reply = QMessageBox.question(self, 'Remove Patron',
                                      'Are you sure you want to remove patron from the database?',
@@ -256,11 +830,10 @@ class MainWindow(QMainWindow):
 
         if reply == QMessageBox.StandardButton.Yes:
             url = urljoin(API_URL, f'patrons/{patron.id}')
-            response = requests.delete(url)
+            response = self.session.delete(url)
 
             if response.status_code == 204 and patron.name.lower() != "benchj":
-                self.patrons.remove(patron)
-                patron_button.setParent(None)
+                self.store.remove_patron(patron)
             else:
                 QMessageBox(QMessageBox.Icon.Critical, 'Delete Error',
                             'An error occurred while trying to delete the patron. Please try again.').exec()
@@ -271,230 +844,507 @@ class MainWindow(QMainWindow):
         file_dialog.setNameFilter("Images (*.png *.xpm *.jpg *.bmp)")
         if file_dialog.exec():
             file_path = file_dialog.selectedFiles()[0]
-            with open(file_path, 'rb') as file:
-                url = urljoin(API_URL, f'patrons/{patron.id}')
-                response = requests.post(url, data={'photo': file})
-                if response.status_code == 200:
-                    patron.photo = response.json()['photo']
-                    self.set_patron_icon(patron, patron_button)
-                else:
-                    QMessageBox(QMessageBox.Icon.Critical, 'Upload Error',
-                                'An error occurred while trying to upload the picture. Please try again.').exec()
 
-    def settle_up(self):
-        # Update order total
-        self.settle_up_dialog.ui.total_label.setText(f'Total: ${self.active_patron.active_order.total:.2f}')
+            # Resize and upload in the background, picture_uploaded picks it up from there
+            self.upload_progress_dialog.setValue(0)
+            self.upload_progress_dialog.show()
+            self.scheduler.submit(self.upload_picture, patron, file_path, priority=Priority.WRITE)
 
-        settled = self.settle_up_dialog.exec()
-        if settled:
-            order_id = self.active_patron.active_order.id
-            url = urljoin(API_URL, f'orders/{order_id}')
-            requests.patch(url, data={'settled': True})
-
-            self.active_patron.active_order.settled = True
+    # Runs on the scheduler
+    def upload_picture(self, patron: Patron, file_path: str):
+        photo_url, photo = None, None
+        try:
+            photo = api.prepare_photo(file_path)
+            response = api.upload_photo(self.session, API_URL, patron.id, photo,
+                                        lambda sent, total: self.upload_progress.emit(sent * 100 // total))
+            response.raise_for_status()
+            photo_url = response.json()['photo']
+            if not isinstance(photo_url, str) or not photo_url:
+                raise ValueError(f'No picture url in the response: {photo_url!r}')
+        except (OSError, requests.RequestException, KeyError, ValueError, TypeError) as e:
+            # Not a picture, unreachable, or a response without the new picture's url in it
+            warnings.warn(f"Uploading a picture for {patron.name} failed: {e!r}")
+            photo_url = None
+        finally:
+            # Closes the progress dialog, whatever went wrong
+            self.upload_finished.emit(patron, photo_url, photo)
+
+    def picture_uploaded(self, patron: Patron, photo_url: str | None, photo: bytes | None):
+        self.upload_progress_dialog.reset()
+
+        if photo_url is None:
+            QMessageBox(QMessageBox.Icon.Critical, 'Upload Error',
+                        'An error occurred while trying to upload the picture. Please try again.').exec()
+            return
 
-            self.back_to_patrons()
+        # Seed the cache with what was just uploaded so the icon isn't downloaded straight back
+        image_cache.store(photo_url, photo)
+        # Unless the patron was removed while uploading
+        if patron.id in self.patron_buttons:
+            self.store.update_patron(patron, patron.name, photo_url)
 
-    def get_new_patron_grid_cell(self, num_patrons: int) -> tuple[int, int]:
-        directions = [(1, 0), (0, 1), (-1, 0), (0, -1)]
-        final_direction = (0, 0)
+    def settle_up(self):
+        # A second tap queued behind the dialog finds the order already settled, or on its way to being settled
+        if self.active_patron.active_order is None or not self.write_finished(self.pending_settle):
+            return
 
-        direction = 0
-        side_length = 1
-        side_position = 0
-        turns_this_length = 0
+        # Update order total and payment QR code
+        self.settle_up_dialog.set_total(self.active_patron.active_order.total, payment_note(self.active_patron.name))
 
-        for i in range(num_patrons):
-            next_direction = directions[direction]
-            final_direction = tuple(map(sum, zip(final_direction, next_direction)))
+        settled = self.settle_up_dialog.exec()
+        if settled and self.active_patron.active_order is not None:
+            # The page goes back to the patrons once the store has the order settled
+            self.pending_settle = self.submit_write(self.send_settle, self.active_patron,
+                                                    self.active_patron.active_order)
+
+    # Runs on the scheduler
+    def send_settle(self, patron: Patron, order: Order):
+        url = urljoin(API_URL, f'orders/{order.id}')
+        headers = {'If-Match': order.etag, IDEMPOTENCY_HEADER: new_idempotency_key()}
+        response = self.session.patch(url, data={'settled': True}, headers=headers)
+
+        if response.status_code == requests.codes.precondition_failed:
+            # Another terminal changed the tab, don't settle a total the patron hasn't seen
+            latest = self.fetch_order(order.id)
+            if not latest.settled:
+                self.store.update_order(patron, latest)
+                self.write_failed.emit(QMessageBox.Icon.Warning, 'Tab Changed',
+                                       'This tab was changed on another terminal, please review it and try again.')
+                return
+        elif not response.ok:
+            # Only a settle the server accepted closes the tab
+            self.write_failed.emit(QMessageBox.Icon.Critical, 'Settle Up Error',
+                                   'An error occurred while trying to settle the tab. Please try again.')
+            return
 
-            side_position += 1
-            if side_position == side_length:
-                direction += 1
-                turns_this_length += 1
-                side_position = 0
+        self.store.settle_order(order)
 
-            if turns_this_length == 2:
-                side_length += 1
-                turns_this_length = 0
+    def show_report(self):
+        self.report_browser.setHtml('<h1>Settlement Report</h1><p>Generating...</p>')
+        self.ui.stacked_widget.setCurrentWidget(self.report_page)
+        self.scheduler.submit(self.generate_report, priority=Priority.READ)
 
-            if direction == 4:
-                direction = 0
+    # Runs on the scheduler. Whatever happens, the page is given something to replace "Generating..." with
+    def generate_report(self):
+        report_html = '<h1>Settlement Report</h1><p>Could not load orders.</p>'
+        try:
+            report_html = to_html(build_report(iter_orders(self.session, API_URL)))
+        except (requests.RequestException, KeyError, ValueError) as e:
+            # Unreachable, or orders that don't look the way the report expects
+            report_html = f'<h1>Settlement Report</h1><p>Could not load orders: {e!r}</p>'
+        finally:
+            self.report_ready.emit(report_html)
+
+    # Cells spiral out from the centre, they are walked once and remembered since every relayout asks for all of them
+    def get_new_patron_grid_cell(self, num_patrons: int) -> tuple[int, int]:
+        directions = [(1, 0), (0, 1), (-1, 0), (0, -1)]
 
-        return final_direction[0] + DEFAULT_SPIRAL_SHELLS, final_direction[1] + DEFAULT_SPIRAL_SHELLS
+        cells = self.spiral_cells
+        if not cells:
+            cells.append((0, 0))
+        while len(cells) <= num_patrons:
+            # Sides grow by one every two turns: 1 right, 1 down, 2 left, 2 up, 3 right...
+            side_length = self.spiral_turns // 2 + 1
+            direction_x, direction_y = directions[self.spiral_turns % 4]
+            x, y = cells[-1]
+            for step in range(1, side_length + 1):
+                cells.append((x + direction_x * step, y + direction_y * step))
+            self.spiral_turns += 1
+
+        x, y = cells[num_patrons]
+        return x + DEFAULT_SPIRAL_SHELLS, y + DEFAULT_SPIRAL_SHELLS
 
     ####################################################################################################################
     # Cart
     ####################################################################################################################
 
     def increase_item_quantity(self, item: OrderItem):
-        item.quantity += 1
-
-        # Update labels
-        item.ui.quantity_label.setText(str(item.quantity))
-        item.ui.total_label.setText(f'${item.total:.2f}')
-        self.update_cart_total()
-
-        if item.quantity > 1:
-            item.ui.decrease_quantity_button.setEnabled(True)
+        self.store.set_cart_quantity(item, item.quantity + 1)
 
     def decrease_item_quantity(self, item: OrderItem):
-        item.quantity -= 1
+        self.store.set_cart_quantity(item, item.quantity - 1)
 
-        # Update labels
-        item.ui.quantity_label.setText(str(item.quantity))
-        item.ui.total_label.setText(f'${item.total:.2f}')
-        self.update_cart_total()
+    @metrics.action('add_to_cart')
+    def add_to_cart(self, drink: Drink):
+        self.store.add_to_cart(drink)
 
-        if item.quantity == 1:
-            item.ui.decrease_quantity_button.setEnabled(False)
+    @metrics.action('remove_from_cart')
+    def remove_from_cart(self, item: OrderItem):
+        self.store.remove_from_cart(item)
 
-    def add_to_cart(self, drink: Drink):
-        for item in self.cart:
-            if item.drink == drink.name:
-                self.increase_item_quantity(item)
-                return
+    def clear_cart(self):
+        self.store.clear_cart()
 
-        item = OrderItem(len(self.cart), drink.name, drink.price, 1)
-        self.cart.append(item)
+    def cart_items_added(self, items: list[OrderItem]):
+        for item in items:
+            cart_row_ui = self.cart_row_pool.acquire()
 
-        cart_row_widget = QWidget()
-        cart_row_ui = Ui_cart_row_template()
-        cart_row_ui.setupUi(cart_row_widget)
+            # Populate labels from information
+            cart_row_ui.name_label.setText(item.drink)
+            cart_row_ui.cost_label.setText(f'${item.price:.2f}')
 
-        # Populate labels from information
-        cart_row_ui.name_label.setText(item.drink)
-        cart_row_ui.cost_label.setText(f'${item.price:.2f}')
-        cart_row_ui.total_label.setText(f'${item.total:.2f}')
+            # Connect UI
+            cart_row_ui.remove_button.clicked.connect(partial(self.remove_from_cart, item))
+            cart_row_ui.increase_quantity_button.clicked.connect(partial(self.increase_item_quantity, item))
+            cart_row_ui.decrease_quantity_button.clicked.connect(partial(self.decrease_item_quantity, item))
 
-        # Connect UI
-        cart_row_ui.remove_button.clicked.connect(lambda: self.remove_from_cart(item))
-        cart_row_ui.increase_quantity_button.clicked.connect(lambda: self.increase_item_quantity(item))
-        cart_row_ui.decrease_quantity_button.clicked.connect(lambda: self.decrease_item_quantity(item))
+            # Add widget to layout
+            self.ui.cart_layout.addWidget(cart_row_ui.widget)
+            cart_row_ui.widget.show()
 
-        # Add widget to layout
-        self.ui.cart_layout.addWidget(cart_row_widget)
+            # Add UI to item for convenience
+            item.ui = cart_row_ui
+            self.update_cart_row(item)
 
-        # Add UI to item for convenience
-        item.ui = cart_row_ui
+        self.update_cart()
 
-        # Update cart total
-        self.update_cart_total()
+    def cart_items_changed(self, items: list[OrderItem]):
+        for item in items:
+            self.update_cart_row(item)
+        self.update_cart()
 
-        # Enable Add to Tab and Clear Cart buttons
-        self.ui.add_to_tab_button.setEnabled(True)
-        self.ui.clear_cart_button.setEnabled(True)
+    def cart_items_removed(self, items: list[OrderItem]):
+        # Return cart rows to the pool
+        for item in items:
+            self.ui.cart_layout.removeWidget(item.ui.widget)
+            self.cart_row_pool.release(item.ui)
+        self.update_cart()
 
-        # Show cart
-        self.set_cart_visible(True)
+    def update_cart_row(self, item: OrderItem):
+        item.ui.quantity_label.setText(str(item.quantity))
+        item.ui.total_label.setText(f'${item.total:.2f}')
+        item.ui.decrease_quantity_button.setEnabled(item.quantity > 1)
 
-    def update_cart_total(self):
-        total = sum(i.total for i in self.cart)
+    # Total, the Add to Tab and Clear Cart buttons, and the cart itself only show while there's something in it
+    def update_cart(self):
+        total = sum(i.total for i in self.store.cart)
         self.ui.cart_total_label.setText(f'Cart Total: ${total:.2f}')
+        self.ui.add_to_tab_button.setEnabled(bool(self.store.cart))
+        self.ui.clear_cart_button.setEnabled(bool(self.store.cart))
+        self.set_cart_visible(bool(self.store.cart))
 
-    def remove_from_cart(self, item: OrderItem):
-        index = self.cart.index(item)
-        self.cart.pop(index)
-        self.ui.cart_layout.itemAt(index).widget().setParent(None)
+    def set_cart_visible(self, visible: bool):
+        self.ui.cart_frame.setVisible(visible)
 
-        self.update_cart_total()
+    ####################################################################################################################
+    # Tab
+    ####################################################################################################################
 
-        # If cart is empty, hide cart
-        if not self.cart:
-            self.set_cart_visible(False)
+    # The patron's usual, if they have one and it's on the menu tonight
+    def usual_drink(self) -> tuple[Drink, int] | None:
+        usual = self.popularity.usual(self.active_patron.name)
+        if usual is not None:
+            name, quantity = usual
+            drink = next((d for d in self.store.drinks if d.name == name), None)
+            if drink is not None:
+                return drink, quantity
+
+    def update_usual_button(self):
+        usual = self.usual_drink()
+        self.ui.usual_button.setVisible(usual is not None)
+        if usual is not None:
+            drink, quantity = usual
+            self.ui.usual_button.setText(f'Usual: {drink.name}' + (f' ×{quantity}' if quantity > 1 else ''))
+
+    # One tap repeat order. Only the usual goes out, anything in the cart stays there to be added (or not) separately
+    @metrics.action('order_usual')
+    def order_usual(self):
+        usual = self.usual_drink()
+        if usual is None or not self.write_finished(self.pending_order_items):
+            return
 
-    def clear_cart(self):
-        self.cart.clear()
+        drink, quantity = usual
+        self.pending_order_items = self.submit_write(self.send_order_items, self.active_patron,
+                                                     self.active_patron.active_order,
+                                                     [{'drink': drink.name, 'quantity': quantity}], False)
 
-        # Clear widgets in cart layout
-        for i in reversed(range(self.ui.cart_layout.count())):
-            self.ui.cart_layout.itemAt(i).widget().setParent(None)
+    @metrics.action('add_to_tab')
+    def add_to_tab(self):
+        # A tap queued up behind the previous one finds the cart already sent, or on its way
+        if not self.store.cart or not self.write_finished(self.pending_order_items):
+            return
 
-        # Reset cart total
-        self.ui.cart_total_label.setText('Cart Total: $0.00')
+        order_items = [{'drink': item.drink, 'quantity': item.quantity} for item in self.store.cart]
+        self.pending_order_items = self.submit_write(self.send_order_items, self.active_patron,
+                                                     self.active_patron.active_order, order_items, True)
 
-        # Disable Add to Tab and Clear Cart buttons
-        self.ui.add_to_tab_button.setEnabled(False)
-        self.ui.clear_cart_button.setEnabled(False)
+    # Runs on the scheduler, show_order_items_sent picks it up on the GUI thread
+    def send_order_items(self, patron: Patron, order: Order, order_items: list[dict], from_cart: bool):
+        data = json.dumps({'order_items': order_items})
+        url = urljoin(API_URL, f'orders/{order.id}')
+        etag = order.etag
+        # Every resend is the same order, so they all share one key
+        idempotency_key = new_idempotency_key()
+        for _ in range(MAX_CONFLICT_RETRIES):
+            headers = {'content-type': 'application/json', 'If-Match': etag, IDEMPOTENCY_HEADER: idempotency_key}
+            request = self.session.patch(url, data=data, headers=headers)
+            if request.status_code != requests.codes.precondition_failed:
+                break
+
+            # New items are purely additive, so rebasing them onto the latest order is just a resend
+            latest = self.fetch_order(order.id)
+            self.store.update_order(patron, latest)
+            etag = latest.etag
+        else:
+            self.write_failed.emit(QMessageBox.Icon.Critical, 'Order Conflict',
+                                   'This tab is being changed on another terminal, please try again.')
+            return
 
-        # Hide cart
-        self.set_cart_visible(False)
+        if not request.ok:
+            # The cart stays as it is, ready to be added again
+            self.write_failed.emit(QMessageBox.Icon.Critical, 'Order Error',
+                                   'An error occurred while trying to add to the tab. Please try again.')
+            return
 
-    def set_cart_visible(self, visible: bool):
-        self.ui.cart_frame.setVisible(visible)
+        order = self.order_from_response(request)
+        self.store.update_order(patron, order)
+        self.order_items_sent.emit(patron, order, from_cart)
 
-    ####################################################################################################################
-    # Tab
-    ####################################################################################################################
+    def show_order_items_sent(self, patron: Patron, order: Order, from_cart: bool):
+        self.popularity.add_order(order)
 
-    def add_to_tab(self):
-        order_id = self.active_patron.active_order.id
-        order_items = []
-        for item in self.cart:
-            order_items.append({'drink': item.drink, 'quantity': item.quantity})
+        # Unless the bartender has moved on to someone else in the meantime
+        if patron is not self.active_patron:
+            return
 
-        data = json.dumps({'order_items': order_items})
-        headers = {'content-type': 'application/json'}
-        url = urljoin(API_URL, f'orders/{order_id}')
-        request = requests.patch(url, data=data, headers=headers)
-        order = self.create_order(request.json())
-        self.active_patron.active_order = order
+        self.update_usual_button()
 
         # Play random soundbyte
-        sound = choice(self.sound_files)
-        path = QUrl(sound)
-        self.player.setSource(path)
-        self.player.play()
+        if self.sound_files:
+            self.play_sound(choice(self.sound_files))
 
-        self.update_tab()
-        self.clear_cart()
+        if from_cart:
+            self.store.clear_cart()
         self.ui.tab_widget.setCurrentIndex(1)
 
+    def play_sound(self, sound: str):
+        if self.player is None:
+            from PyQt6.QtMultimedia import QMediaPlayer, QAudioOutput
+
+            self.player = QMediaPlayer(self)
+            self.output = QAudioOutput(self)
+            self.player.setAudioOutput(self.output)
+            self.output.setVolume(50)
+
+        self.player.setSource(QUrl(sound))
+        self.player.play()
+
+    # Renders the active patron's tab from scratch, from then on the rows follow the store's order signals
+    @metrics.timed('update_tab')
     def update_tab(self):
-        for i in reversed(range(self.ui.tab_layout.count())):
-            self.ui.tab_layout.itemAt(i).widget().setParent(None)
+        # Return tab rows to the pool
+        for tab_row_ui in self.tab_rows.values():
+            self.ui.tab_layout.removeWidget(tab_row_ui.widget)
+            self.tab_row_pool.release(tab_row_ui)
+        self.tab_rows.clear()
+        self.tab_order = None
 
         order = self.active_patron.active_order
         if order is None:
-            # If active order does not exist, create new order
-            url = urljoin(API_URL, 'orders')
-            request = requests.post(url, data={'patron': self.active_patron.name})
-            order = Order(**request.json())
-            self.active_patron.orders.append(order)
+            # If active order does not exist, create new order (or wait for the one started on press-down)
+            future = self.pending_orders.pop(self.active_patron.id, None)
+            # Cancelled if the scheduler was shut down before it got to it
+            if future is None or future.cancelled():
+                order = self.post_new_order(self.active_patron.name)
+            else:
+                order = future.result()
+            self.store.update_order(self.active_patron, order)
+        self.tab_order = order
+
+        # Use the rows rendered ahead of time if they still match the order
+        tab_rows = None
+        entry = self.prefetched_tabs.pop(self.active_patron.id, None)
+        if entry is not None:
+            if self.is_current_tab(entry, order):
+                tab_rows = entry[2]
+            else:
+                for tab_row_ui in entry[2]:
+                    self.tab_row_pool.release(tab_row_ui)
 
-        self.ui.settle_up_button.setEnabled(False)
-        order.total = 0
+        if tab_rows is None:
+            tab_rows = [self.build_tab_row(item) for item in order.order_items]
 
-        for item in order.order_items:
-            tab_row_widget = QWidget()
-            tab_row_ui = Ui_tab_row_template()
-            tab_row_ui.setupUi(tab_row_widget)
+        for item, tab_row_ui in zip(order.order_items, tab_rows):
+            self.add_tab_row(item, tab_row_ui)
 
-            # Populate labels from information
-            tab_row_ui.name_label.setText(item.drink)
-            tab_row_ui.cost_label.setText(f'${(item.total / item.quantity):.2f}')
-            tab_row_ui.quantity_label.setText(str(item.quantity))
-            tab_row_ui.total_label.setText(f'${item.total:.2f}')
+        self.update_tab_total()
 
-            # Connect UI
-            tab_row_ui.remove_button.clicked.connect(partial(self.remove_from_tab, item))
+    def add_tab_row(self, item: OrderItem, tab_row_ui: Ui_tab_row_template):
+        self.ui.tab_layout.addWidget(tab_row_ui.widget)
+        tab_row_ui.widget.show()
+        self.tab_rows[item.id] = tab_row_ui
 
-            # Add widget to layout
-            self.ui.tab_layout.addWidget(tab_row_widget)
+    def update_tab_total(self):
+        order = self.tab_order
+        order.total = sum(item.total for item in order.order_items)
+        self.ui.settle_up_button.setEnabled(bool(order.order_items))
+        self.ui.tab_total_label.setText(f'Total: ${order.total:.2f}')
 
-            # Enable settle up button
-            self.ui.settle_up_button.setEnabled(True)
+        # Have the payment QR code for this total ready before Settle Up is tapped
+        if order.total:
+            self.scheduler.submit(render_payment_qr, round(order.total * 100), payment_note(order.patron),
+                                  self.settle_up_dialog.width())
 
-            # Update order total
-            order.total += item.total
+    @metrics.timed('widget.tab_row')
+    def build_tab_row(self, item: OrderItem) -> Ui_tab_row_template:
+        tab_row_ui = self.tab_row_pool.acquire()
+        self.fill_tab_row(tab_row_ui, item)
 
-        self.ui.tab_total_label.setText(f'Total: ${order.total:.2f}')
+        # Connect UI
+        tab_row_ui.remove_button.clicked.connect(partial(self.remove_from_tab, item))
+
+        return tab_row_ui
+
+    @staticmethod
+    def fill_tab_row(tab_row_ui: Ui_tab_row_template, item: OrderItem):
+        # Populate labels from information
+        tab_row_ui.name_label.setText(item.drink)
+        tab_row_ui.cost_label.setText(f'${(item.total / item.quantity):.2f}')
+        tab_row_ui.quantity_label.setText(str(item.quantity))
+        tab_row_ui.total_label.setText(f'${item.total:.2f}')
+
+    # Changes to any other order only make its prefetched rows stale
+    def showing_order(self, order: Order) -> bool:
+        if order is self.tab_order:
+            return True
+
+        for patron_id, entry in list(self.prefetched_tabs.items()):
+            if entry[0] is order:
+                self.discard_prefetched_tab(patron_id)
+        return False
+
+    # A new tab for the patron being served, e.g. opened on another terminal after theirs was settled
+    def order_added(self, patron: Patron, order: Order):
+        if patron is self.active_patron and order is patron.active_order and order is not self.tab_order:
+            self.update_tab()
+
+    def tab_items_added(self, order: Order, items: list[OrderItem]):
+        if not self.showing_order(order):
+            return
+
+        for item in items:
+            if item.id not in self.tab_rows:
+                self.add_tab_row(item, self.build_tab_row(item))
+        self.update_tab_total()
+
+    def tab_items_changed(self, order: Order, items: list[OrderItem]):
+        if not self.showing_order(order):
+            return
+
+        for item in items:
+            tab_row_ui = self.tab_rows.get(item.id)
+            if tab_row_ui is not None:
+                self.fill_tab_row(tab_row_ui, item)
+        self.update_tab_total()
+
+    def tab_items_removed(self, order: Order, items: list[OrderItem]):
+        if not self.showing_order(order):
+            return
+
+        # Return tab rows to the pool
+        for item in items:
+            tab_row_ui = self.tab_rows.pop(item.id, None)
+            if tab_row_ui is not None:
+                self.ui.tab_layout.removeWidget(tab_row_ui.widget)
+                self.tab_row_pool.release(tab_row_ui)
+        self.update_tab_total()
+
+    # Settled here or on another terminal, either way this tab is closed
+    def order_settled(self, order: Order):
+        if self.showing_order(order) and self.ui.stacked_widget.currentIndex() == 1:
+            self.back_to_patrons()
+
+    # Tab writes go out on the scheduler so the GUI thread never waits on the server, and anything that goes wrong is
+    # reported back through write_failed
+    def submit_write(self, fn, *args) -> Future:
+        future = self.scheduler.submit(fn, *args, priority=Priority.WRITE)
+        future.add_done_callback(partial(self.write_done, fn.__name__))
+        return future
+
+    # Runs on the scheduler
+    def write_done(self, name: str, future: Future):
+        if future.cancelled():
+            return
+
+        e = future.exception()
+        if isinstance(e, requests.RequestException):
+            warnings.warn(f"{name} failed: {e}")
+            self.write_failed.emit(QMessageBox.Icon.Critical, 'Server Unreachable', UNREACHABLE_MESSAGE)
+        elif e is not None:
+            warnings.warn(f"{name} failed: {e!r}")
+
+    @staticmethod
+    def write_finished(future: Future | None) -> bool:
+        return future is None or future.done()
+
+    def show_write_error(self, icon: QMessageBox.Icon, title: str, text: str):
+        QMessageBox(icon, title, text).exec()
+
+    # Runs on the scheduler, so no widget access in here
+    def post_new_order(self, patron_name: str) -> Order:
+        url = urljoin(API_URL, 'orders')
+        request = self.session.post(url, data={'patron': patron_name})
+        return self.order_from_response(request)
 
+    @metrics.action('remove_from_tab')
     def remove_from_tab(self, item: OrderItem):
+        self.submit_write(self.delete_order_item, self.active_patron, self.active_patron.active_order, item)
+
+    # Runs on the scheduler. The store keeps the order and its items the same objects when it merges in the latest
+    # copy, so order and item stay the ones on screen throughout
+    def delete_order_item(self, patron: Patron, order: Order, item: OrderItem):
         url = urljoin(API_URL, f'order_items/{item.id}')
-        requests.delete(url)
-        self.active_patron.active_order.order_items.remove(item)
-        self.update_tab()
+        base_items, etag, version = list(order.order_items), order.etag, order.version
+
+        idempotency_key = new_idempotency_key()
+        for _ in range(MAX_CONFLICT_RETRIES):
+            response = self.session.delete(url, headers={'If-Match': etag, IDEMPOTENCY_HEADER: idempotency_key})
+            if response.ok:
+                self.store.remove_order_item(order, item, self.version_from_response(response, version + 1))
+                self.tab_item_deleted.emit(item.id)
+                break
+            if response.status_code == requests.codes.not_found:
+                # Already gone on the server
+                self.store.remove_order_item(order, item, version)
+                self.tab_item_deleted.emit(item.id)
+                break
+            if response.status_code != requests.codes.precondition_failed:
+                # The item is still on the server, so it stays on the tab here too
+                self.write_failed.emit(QMessageBox.Icon.Critical, 'Remove Error',
+                                       'An error occurred while trying to remove the item. Please try again.')
+                break
+
+            # Merge our removal with whatever the other terminal did to the order
+            latest = self.fetch_order(order.id)
+            ours = [i for i in base_items if i.id != item.id]
+            merged = merge_order_items(base_items, ours, latest.order_items)
+
+            self.store.update_order(patron, latest)
+            base_items, etag, version = latest.order_items, latest.etag, latest.version
+
+            # Removed elsewhere already, or changed elsewhere so the merge kept it
+            if all(i.id != item.id for i in latest.order_items) or any(i.id == item.id for i in merged):
+                break
+        else:
+            self.write_failed.emit(QMessageBox.Icon.Critical, 'Order Conflict',
+                                   'This tab is being changed on another terminal, please try again.')
+
+    def fetch_order(self, order_id: int) -> Order:
+        url = urljoin(API_URL, f'orders/{order_id}')
+        response = self.session.get(url)
+        response.raise_for_status()
+        return self.order_from_response(response)
+
+    def order_from_response(self, response: requests.Response) -> Order:
+        order = self.create_order(response.json())
+        order.version = self.version_from_response(response, order.version)
+        return order
+
+    @staticmethod
+    def version_from_response(response: requests.Response, default: int) -> int:
+        # Prefer the ETag header (e.g. W/"3"), fall back to whatever version the body carried
+        etag = response.headers.get('ETag', '').removeprefix('W/').strip('"')
+        return int(etag) if etag.isdigit() else default
 
     def create_order(self, order_json: dict) -> Order:
         items = []
@@ -512,6 +1362,28 @@ class MainWindow(QMainWindow):
     # Drink Menu
     ####################################################################################################################
 
+    # Items already counted are skipped, so this is cheap to repeat after every sync
+    def count_orders(self, patron: Patron):
+        for order in patron.orders:
+            self.popularity.add_order(order)
+
+    # Most ordered drinks first (for this patron, at this hour, then overall), moving the existing tiles around
+    @metrics.timed('arrange_menu')
+    def arrange_menu(self, patron: Patron):
+        # Drinks only just put on the menu get their tiles when the store's changes go out
+        drinks = [drink for drink in self.store.drinks if drink.id in self.drink_widgets]
+        drinks = self.popularity.rank(drinks, patron.name, datetime.now().hour)
+        menu_order = [drink.id for drink in drinks]
+        if menu_order != self.menu_order:
+            self.menu_order = menu_order
+            for i, drink in enumerate(drinks):
+                drink_widget = self.drink_widgets[drink.id]
+                self.ui.menu_grid_layout.removeWidget(drink_widget)
+                self.ui.menu_grid_layout.addWidget(drink_widget, i // DRINK_COLUMNS, i % DRINK_COLUMNS)
+
+        self.ui.scrollArea.verticalScrollBar().setValue(0)
+
+    @metrics.timed('widget.drink_tile')
     def add_drink_to_menu(self, drink: Drink, x: int, y: int):
         # Init new widget from template
         drink_widget = QWidget()
@@ -536,25 +1408,59 @@ class MainWindow(QMainWindow):
 
         # Add widget to layout
         self.ui.menu_grid_layout.addWidget(drink_widget, x, y)
+        self.drink_widgets[drink.id] = drink_widget
 
+    @metrics.timed('load_drinks')
     def load_drinks(self):
-        # Fetch drinks
         # TODO(brett): error handling on request
-        url = urljoin(API_URL, 'drinks')
         try:
-            request = requests.get(url)
+            drinks = self.fetch_drinks()
         except ConnectTimeout:
             warnings.warn("Database connection timed out")
             return
+        except requests.RequestException as e:
+            warnings.warn(f"Loading drinks failed: {e}")
+            return
+
+        self.store.set_menu(drinks)
 
-        # Populate drink menu
-        drinks_json = [d for d in request.json() if d['in_stock']]
-        for i, drink_json in enumerate(drinks_json):
+    def populate_menu(self, drinks: list[Drink]):
+        # Clear out the previous menu
+        for i in reversed(range(self.ui.menu_grid_layout.count())):
+            drink_widget = self.ui.menu_grid_layout.itemAt(i).widget()
+            self.ui.menu_grid_layout.removeWidget(drink_widget)
+            drink_widget.deleteLater()
+
+        self.drink_widgets = {}
+        self.menu_order = [drink.id for drink in drinks]
+        for i, drink in enumerate(drinks):
+            self.add_drink_to_menu(drink, i // DRINK_COLUMNS, i % DRINK_COLUMNS)
+
+    def fetch_drinks(self) -> list[Drink]:
+        # Fetch drinks
+        url = urljoin(API_URL, 'drinks')
+        request = self.session.get(url)
+
+        drinks = []
+        for drink_json in [d for d in request.json() if d['in_stock']]:
             # Create image object
-            request = requests.get(drink_json['photo'], stream=True)
-            drink_json['photo'] = ImageQt(Image.open(request.raw))
+            drink_json['photo_url'] = drink_json['photo']
+            drink_json['photo'] = self.fetch_drink_thumbnail(drink_json['photo'])
 
             # Construct drink object
-            drink = Drink(**drink_json)
+            drinks.append(Drink(**drink_json))
 
-            self.add_drink_to_menu(drink, i // DRINK_COLUMNS, i % DRINK_COLUMNS)
+        return drinks
+
+    # Drink photos are packed at tile size, that's all the menu ever shows
+    def fetch_drink_thumbnail(self, url: str) -> QtGui.QImage:
+        photo = image_pack.load(url)
+        if photo is not None:
+            return photo
+
+        request = self.session.get(url, stream=True)
+        with metrics.span('image.decode', kind='drink'):
+            photo = decode_thumbnail(request.raw, DRINK_TILE_SIZE)
+
+        image_pack.add(url, photo)
+        return photo
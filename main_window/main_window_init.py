@@ -162,6 +162,13 @@ class Ui_main_window(object):
         self.patron_selection_page.setObjectName("patron_selection_page")
         self.gridLayout = QtWidgets.QGridLayout(self.patron_selection_page)
         self.gridLayout.setObjectName("gridLayout")
+        self.patron_search_edit = QtWidgets.QLineEdit(parent=self.patron_selection_page)
+        font = QtGui.QFont()
+        font.setPointSize(16)
+        self.patron_search_edit.setFont(font)
+        self.patron_search_edit.setClearButtonEnabled(True)
+        self.patron_search_edit.setObjectName("patron_search_edit")
+        self.gridLayout.addWidget(self.patron_search_edit, 0, 0, 1, 3)
         self.patron_selection_layout = QtWidgets.QGridLayout()
         self.patron_selection_layout.setObjectName("patron_selection_layout")
         self.new_patron_button = QtWidgets.QPushButton(parent=self.patron_selection_page)
@@ -177,17 +184,17 @@ class Ui_main_window(object):
         self.new_patron_button.setFont(font)
         self.new_patron_button.setObjectName("new_patron_button")
         self.patron_selection_layout.addWidget(self.new_patron_button, 0, 0, 1, 1)
-        self.gridLayout.addLayout(self.patron_selection_layout, 1, 1, 1, 1)
+        self.gridLayout.addLayout(self.patron_selection_layout, 2, 1, 1, 1)
         spacerItem = QtWidgets.QSpacerItem(40, 20, QtWidgets.QSizePolicy.Policy.Expanding, QtWidgets.QSizePolicy.Policy.Minimum)
-        self.gridLayout.addItem(spacerItem, 1, 2, 1, 1)
+        self.gridLayout.addItem(spacerItem, 2, 2, 1, 1)
         spacerItem1 = QtWidgets.QSpacerItem(20, 40, QtWidgets.QSizePolicy.Policy.Minimum, QtWidgets.QSizePolicy.Policy.Expanding)
-        self.gridLayout.addItem(spacerItem1, 0, 1, 1, 1)
+        self.gridLayout.addItem(spacerItem1, 1, 1, 1, 1)
         spacerItem2 = QtWidgets.QSpacerItem(40, 20, QtWidgets.QSizePolicy.Policy.Expanding, QtWidgets.QSizePolicy.Policy.Minimum)
-        self.gridLayout.addItem(spacerItem2, 1, 0, 1, 1)
+        self.gridLayout.addItem(spacerItem2, 2, 0, 1, 1)
         spacerItem3 = QtWidgets.QSpacerItem(20, 40, QtWidgets.QSizePolicy.Policy.Minimum, QtWidgets.QSizePolicy.Policy.Expanding)
-        self.gridLayout.addItem(spacerItem3, 2, 1, 1, 1)
+        self.gridLayout.addItem(spacerItem3, 3, 1, 1, 1)
         self.gridLayout.setColumnStretch(1, 1)
-        self.gridLayout.setRowStretch(1, 1)
+        self.gridLayout.setRowStretch(2, 1)
         self.stacked_widget.addWidget(self.patron_selection_page)
         self.page_2 = QtWidgets.QWidget()
         self.page_2.setObjectName("page_2")
@@ -211,6 +218,13 @@ class Ui_main_window(object):
         self.horizontalLayout_7.addWidget(self.patron_name_label)
         spacerItem4 = QtWidgets.QSpacerItem(40, 20, QtWidgets.QSizePolicy.Policy.Expanding, QtWidgets.QSizePolicy.Policy.Minimum)
         self.horizontalLayout_7.addItem(spacerItem4)
+        self.usual_button = QtWidgets.QPushButton(parent=self.page_2)
+        font = QtGui.QFont()
+        font.setPointSize(16)
+        self.usual_button.setFont(font)
+        self.usual_button.setStyleSheet("padding: 10px 20px")
+        self.usual_button.setObjectName("usual_button")
+        self.horizontalLayout_7.addWidget(self.usual_button)
         self.verticalLayout_7.addLayout(self.horizontalLayout_7)
         self.line_4 = QtWidgets.QFrame(parent=self.page_2)
         self.line_4.setFrameShape(QtWidgets.QFrame.Shape.HLine)
@@ -529,6 +543,7 @@ class Ui_main_window(object):
     def retranslateUi(self, main_window):
         _translate = QtCore.QCoreApplication.translate
         main_window.setWindowTitle(_translate("main_window", "POS"))
+        self.patron_search_edit.setPlaceholderText(_translate("main_window", "Search patrons"))
         self.new_patron_button.setText(_translate("main_window", "+"))
         self.back_to_patrons_button.setText(_translate("main_window", "🡐 Back to Patrons"))
         self.label.setText(_translate("main_window", "Available Drinks"))
@@ -0,0 +1,171 @@
+import inspect
+import json
+import logging
+import re
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from logging.handlers import RotatingFileHandler
+from urllib.parse import urlsplit
+
+import requests
+from PyQt6.QtCore import QTimer
+
+from utilities import data_path
+
+METRICS_LOG_FILE = 'metrics.jsonl'
+METRICS_LOG_MAX_BYTES = 5 * 2 ** 20
+METRICS_LOG_BACKUPS = 3
+# Set to a port to serve Prometheus style text on http://localhost:<port>/metrics
+METRICS_PORT: int | None = None
+# Recent samples kept per span for quantiles
+SAMPLE_WINDOW = 2048
+QUANTILES = 0.5, 0.9, 0.99
+
+logger = logging.getLogger(__name__)
+_samples: dict[str, deque] = defaultdict(lambda: deque(maxlen=SAMPLE_WINDOW))
+_counters: dict[str, int] = defaultdict(int)
+_lock = threading.Lock()
+_exporter: logging.Logger | None = None
+
+
+def start(port: int | None = METRICS_PORT):
+    global _exporter
+
+    # JSON lines go to their own rotating file, not through the app log
+    handler = RotatingFileHandler(data_path(METRICS_LOG_FILE), maxBytes=METRICS_LOG_MAX_BYTES,
+                                  backupCount=METRICS_LOG_BACKUPS, encoding='utf-8')
+    _exporter = logging.getLogger(f'{__name__}.export')
+    _exporter.propagate = False
+    _exporter.setLevel(logging.INFO)
+    _exporter.addHandler(handler)
+
+    if port is not None:
+        server = ThreadingHTTPServer(('127.0.0.1', port), _PrometheusHandler)
+        threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+        logger.info('Serving metrics on http://127.0.0.1:%d/metrics', port)
+
+
+def record(name: str, seconds: float, **fields):
+    with _lock:
+        _samples[name].append(seconds)
+        _counters[name] += 1
+
+    if _exporter is not None:
+        _exporter.info(json.dumps({'ts': time.time(), 'span': name, 'ms': round(seconds * 1000, 3), **fields}))
+
+
+def increment(name: str, value: int = 1):
+    with _lock:
+        _counters[name] += value
+
+
+@contextmanager
+def span(name: str, **fields):
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start_time, **fields)
+
+
+# Qt passes extra signal arguments (e.g. clicked's checked flag) to any slot that accepts *args, so only forward as
+# many positional arguments as the wrapped function actually takes
+def trim_args(func):
+    parameters = inspect.signature(func).parameters.values()
+    if any(p.kind == p.VAR_POSITIONAL for p in parameters):
+        return None
+    return sum(p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD) for p in parameters)
+
+
+def timed(name: str):
+    def decorator(func):
+        max_args = trim_args(func)
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args[:max_args], **kwargs)
+        return wrapper
+    return decorator
+
+
+# Times a user action from the tap until the event loop comes back around after the handler, which is when the queued
+# layout and paint work has had its turn
+def action(name: str):
+    def decorator(func):
+        max_args = trim_args(func)
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            start_time = time.perf_counter()
+            try:
+                return func(*args[:max_args], **kwargs)
+            finally:
+                record(f'{name}.handler', time.perf_counter() - start_time)
+                QTimer.singleShot(0, lambda: record(f'{name}.render', time.perf_counter() - start_time))
+        return wrapper
+    return decorator
+
+
+# Record every request made through the session, grouped by method and path with ids collapsed
+def instrument_session(session: requests.Session):
+    def hook(response: requests.Response, *_, **__):
+        path = re.sub(r'/\d+', '/{id}', urlsplit(response.request.url).path)
+        record(f'api.{response.request.method} {path}', response.elapsed.total_seconds(), status=response.status_code)
+
+    session.hooks['response'].append(hook)
+
+
+def quantile(sorted_samples: list[float], q: float) -> float:
+    return sorted_samples[min(int(q * len(sorted_samples)), len(sorted_samples) - 1)]
+
+
+def summary() -> dict[str, dict[str, float]]:
+    with _lock:
+        snapshot = {name: sorted(samples) for name, samples in _samples.items()}
+        counters = dict(_counters)
+
+    result = {}
+    for name, samples in snapshot.items():
+        if samples:
+            result[name] = {f'p{round(q * 100)}': quantile(samples, q) for q in QUANTILES}
+            result[name]['count'] = counters.get(name, len(samples))
+    return result
+
+
+def prometheus_text() -> str:
+    lines = ['# TYPE pos_span_seconds summary']
+    for name, stats in summary().items():
+        label = name.replace('\\', '\\\\').replace('"', '\\"')
+        for q in QUANTILES:
+            lines.append(f'pos_span_seconds{{span="{label}",quantile="{q}"}} {stats[f"p{round(q * 100)}"]:.6f}')
+        lines.append(f'pos_span_seconds_count{{span="{label}"}} {stats["count"]}')
+
+    with _lock:
+        counters = {name: value for name, value in _counters.items() if name not in _samples}
+    if counters:
+        lines.append('# TYPE pos_events_total counter')
+        lines.extend(f'pos_events_total{{event="{name}"}} {value}' for name, value in counters.items())
+
+    return '\n'.join(lines) + '\n'
+
+
+class _PrometheusHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != '/metrics':
+            self.send_error(404)
+            return
+
+        body = prometheus_text().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *_):
+        pass
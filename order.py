@@ -1,4 +1,4 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from datetime import datetime
 
 
@@ -22,3 +22,41 @@ class Order:
     patron: str
     settled: bool
     created: datetime
+    version: int = 0
+
+    # Value sent in If-Match so the server can reject writes based on a stale copy of the order
+    @property
+    def etag(self) -> str:
+        return f'"{self.version}"'
+
+
+# Three-way merge of order items keyed by item id. Items without an id (or with an id unknown to the base) are
+# treated as new local items. Remote deletions win, local deletions only apply if the remote item is untouched and
+# quantity changes from both sides are summed relative to the base.
+def merge_order_items(base: list[OrderItem], ours: list[OrderItem], theirs: list[OrderItem]) -> list[OrderItem]:
+    base_by_id = {item.id: item for item in base if item.id is not None}
+    ours_by_id = {item.id: item for item in ours if item.id is not None}
+
+    merged = []
+    for their_item in theirs:
+        base_item = base_by_id.get(their_item.id)
+        if base_item is None:
+            # Added on another terminal
+            merged.append(replace(their_item))
+            continue
+
+        our_item = ours_by_id.get(their_item.id)
+        if our_item is None:
+            # Deleted locally, keep it only if another terminal changed it in the meantime
+            if their_item.quantity != base_item.quantity:
+                merged.append(replace(their_item))
+            continue
+
+        quantity = their_item.quantity + our_item.quantity - base_item.quantity
+        if quantity > 0:
+            merged.append(replace(their_item, quantity=quantity))
+
+    # Items added locally that the server has not seen yet
+    merged.extend(replace(item) for item in ours if item.id is None or item.id not in base_by_id)
+
+    return merged
@@ -1,6 +1,5 @@
 from dataclasses import dataclass
 
-from PIL.ImageQt import ImageQt
 from PyQt6.QtGui import QMovie
 
 from order import Order
@@ -12,7 +11,8 @@ class Patron:
     name: str
     orders: list[Order]
     balance: float
-    photo: ImageQt
+    # URL of the patron's picture
+    photo: str | None
     movie: QMovie = None
 
     @property
@@ -21,13 +21,6 @@ class Patron:
             if not order.settled:
                 return order
 
-    @active_order.setter
-    def active_order(self, updated_order):
-        for order in self.orders:
-            if not order.settled:
-                order.__dict__.update(updated_order.__dict__)
-                break
-
     @property
     def settled_orders(self) -> list[Order]:
         return [order for order in self.orders if order.settled]
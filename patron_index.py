@@ -0,0 +1,92 @@
+import bisect
+from collections import defaultdict
+
+from patron import Patron
+
+SEARCH_LIMIT = 24
+
+
+def normalize(name: str) -> str:
+    return ' '.join(name.casefold().split())
+
+
+def trigrams(text: str) -> set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+# Case-insensitive patron lookup by exact name, by the start of the name or any word in it, and by any part of the name
+# through a trigram index. Every lookup only touches the patrons that match
+class PatronIndex:
+    def __init__(self):
+        self.patrons: dict[int, Patron] = {}
+        # Normalized name a patron is indexed under, by id
+        self.names: dict[int, str] = {}
+        self.by_name: dict[str, int] = {}
+        # (name or word in the name, patron id) sorted, so names starting with a prefix are next to each other
+        self.keys: list[tuple[str, int]] = []
+        self.trigrams: dict[str, set[int]] = defaultdict(set)
+
+    @staticmethod
+    def keys_for(name: str) -> set[str]:
+        return {name, *name.split(' ')}
+
+    def add(self, patron: Patron):
+        name = normalize(patron.name)
+        self.patrons[patron.id] = patron
+        self.names[patron.id] = name
+        self.by_name[name] = patron.id
+        for key in self.keys_for(name):
+            bisect.insort(self.keys, (key, patron.id))
+        for trigram in trigrams(name):
+            self.trigrams[trigram].add(patron.id)
+
+    def remove(self, patron_id: int):
+        name = self.names.pop(patron_id, None)
+        if name is None:
+            return
+
+        del self.patrons[patron_id]
+        if self.by_name.get(name) == patron_id:
+            del self.by_name[name]
+        for key in self.keys_for(name):
+            i = bisect.bisect_left(self.keys, (key, patron_id))
+            if i < len(self.keys) and self.keys[i] == (key, patron_id):
+                del self.keys[i]
+        for trigram in trigrams(name):
+            self.trigrams[trigram].discard(patron_id)
+            if not self.trigrams[trigram]:
+                del self.trigrams[trigram]
+
+    # Re-index a patron after a rename
+    def update(self, patron: Patron):
+        self.remove(patron.id)
+        self.add(patron)
+
+    def get(self, patron_id: int) -> Patron | None:
+        return self.patrons.get(patron_id)
+
+    def find(self, name: str) -> Patron | None:
+        patron_id = self.by_name.get(normalize(name))
+        return None if patron_id is None else self.patrons[patron_id]
+
+    # Names or words starting with the query first, then names containing it anywhere
+    def search(self, query: str, limit: int = SEARCH_LIMIT) -> list[Patron]:
+        query = normalize(query)
+        if not query:
+            return []
+
+        found: dict[int, None] = {}
+        i = bisect.bisect_left(self.keys, (query,))
+        while i < len(self.keys) and self.keys[i][0].startswith(query) and len(found) < limit:
+            found.setdefault(self.keys[i][1])
+            i += 1
+
+        if len(query) >= 3 and len(found) < limit:
+            candidates = set.intersection(*(self.trigrams.get(trigram, set()) for trigram in trigrams(query)))
+            for patron_id in sorted(candidates - found.keys(), key=self.names.__getitem__):
+                if query in self.names[patron_id]:
+                    found.setdefault(patron_id)
+                    if len(found) == limit:
+                        break
+
+        return [self.patrons[patron_id] for patron_id in found]
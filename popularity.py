@@ -0,0 +1,69 @@
+from collections import Counter, defaultdict
+
+from drink import Drink
+from order import Order
+
+# How much a patron's own history and the current hour of the night count for, next to the all-night counts
+PATRON_WEIGHT = 4
+HOUR_WEIGHT = 2
+
+
+# Drinks ordered so far, all night, per hour of the night and per patron. Every item is counted once by id, so orders
+# can be fed in again after every sync and an update only touches the counters of the items that changed
+class PopularityIndex:
+    def __init__(self):
+        self.overall = Counter()
+        self.by_hour: dict[int, Counter] = defaultdict(Counter)
+        self.by_patron: dict[str, Counter] = defaultdict(Counter)
+        # How many times each patron ordered each drink at each quantity
+        self.quantities: dict[tuple[str, str], Counter] = defaultdict(Counter)
+        # Item id to what it was counted as: (drink, patron, hour, quantity)
+        self.items: dict[int, tuple[str, str, int, int]] = {}
+
+    def add_order(self, order: Order):
+        for item in order.order_items:
+            if item.id is not None:
+                self.add_item(item.id, item.drink, order.patron, order.created.hour, item.quantity)
+
+    def add_item(self, item_id: int, drink: str, patron: str, hour: int, quantity: int):
+        counted = drink, patron, hour, quantity
+        if self.items.get(item_id) == counted:
+            return
+
+        self.remove_item(item_id)
+        self.items[item_id] = counted
+        self.overall[drink] += quantity
+        self.by_hour[hour][drink] += quantity
+        self.by_patron[patron][drink] += quantity
+        self.quantities[patron, drink][quantity] += 1
+
+    def remove_item(self, item_id: int):
+        counted = self.items.pop(item_id, None)
+        if counted is not None:
+            drink, patron, hour, quantity = counted
+            self.overall[drink] -= quantity
+            self.by_hour[hour][drink] -= quantity
+            self.by_patron[patron][drink] -= quantity
+            self.quantities[patron, drink][quantity] -= 1
+
+    # The patron's most ordered drink, at the quantity they usually have it
+    def usual(self, patron: str) -> tuple[str, int] | None:
+        favorites = self.by_patron.get(patron)
+        if not favorites:
+            return None
+
+        drink, count = favorites.most_common(1)[0]
+        if count <= 0:
+            return None
+        quantity, _ = self.quantities[patron, drink].most_common(1)[0]
+        return drink, quantity
+
+    # Most popular first, drinks nobody has ordered yet keep their menu order
+    def rank(self, drinks: list[Drink], patron: str | None, hour: int) -> list[Drink]:
+        by_patron = self.by_patron.get(patron, Counter())
+        by_hour = self.by_hour.get(hour, Counter())
+
+        def score(drink: Drink) -> int:
+            return PATRON_WEIGHT * by_patron[drink.name] + HOUR_WEIGHT * by_hour[drink.name] + self.overall[drink.name]
+
+        return sorted(drinks, key=score, reverse=True)
@@ -1,16 +1,26 @@
+import logging
 import sys
+import time
+
+STARTUP_TIME = time.perf_counter()
 
 # 3rd party imports
 import qdarktheme
+from PyQt6.QtCore import QTimer
 from PyQt6.QtWidgets import QApplication
 
 # Local imports
+import metrics
+import theme
 from main_window import MainWindow
 
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(name)s %(levelname)s %(message)s')
+    metrics.start()
+
     # Initialize Qt sys
     app = QApplication(sys.argv)
-    qdarktheme.setup_theme()
+    qdarktheme.setup_theme(additional_qss=theme.additional_qss())
 
     # Create instance of main control class
     instance = MainWindow()
@@ -20,5 +30,8 @@ if __name__ == '__main__':
     instance.activateWindow()
     instance.showFullScreen()
 
+    # Launch-to-ready time, measured once the first frame has been processed
+    QTimer.singleShot(0, lambda: metrics.record('startup.ready', time.perf_counter() - STARTUP_TIME))
+
     # Execute and close on end on program exit
     sys.exit(app.exec())
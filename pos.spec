@@ -1,9 +1,29 @@
 # -*- mode: python ; coding: utf-8 -*-
+import os
+
 from PyInstaller.utils.hooks import copy_metadata
 
 
 block_cipher = None
 
+# 'startup' (default) skips UPX so nothing has to be decompressed at launch, 'compact' UPX-compresses everything
+PROFILE = os.environ.get('POS_BUILD_PROFILE', 'startup')
+UPX = PROFILE == 'compact'
+
+# Qt modules the POS never imports
+QT_EXCLUDES = [
+    f'PyQt6.{module}' for module in (
+        'Qt3DAnimation', 'Qt3DCore', 'Qt3DExtras', 'Qt3DInput', 'Qt3DLogic', 'Qt3DRender', 'QtBluetooth',
+        'QtCharts', 'QtDataVisualization', 'QtDBus', 'QtDesigner', 'QtHelp', 'QtNfc', 'QtOpenGL',
+        'QtOpenGLWidgets', 'QtPdf', 'QtPdfWidgets', 'QtPositioning', 'QtPrintSupport', 'QtQml', 'QtQuick',
+        'QtQuick3D', 'QtQuickWidgets', 'QtRemoteObjects', 'QtSensors', 'QtSerialPort', 'QtSpatialAudio', 'QtSql',
+        'QtSvgWidgets', 'QtTest', 'QtTextToSpeech', 'QtWebChannel', 'QtWebEngineCore', 'QtWebEngineQuick',
+        'QtWebEngineWidgets', 'QtWebSockets', 'QtXml',
+    )
+]
+# Binaries loaded on every launch, never worth compressing even in the compact profile
+UPX_EXCLUDE = ['python3*.dll', 'vcruntime140*.dll', 'Qt6Core.dll', 'Qt6Gui.dll', 'Qt6Widgets.dll', 'qwindows.dll']
+
 
 a = Analysis(
     ['pos.py'],
@@ -14,7 +34,7 @@ a = Analysis(
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    excludes=QT_EXCLUDES + ['tkinter', 'unittest', 'pydoc', 'PIL.ImageTk'],
     win_no_prefer_redirects=False,
     win_private_assemblies=False,
     cipher=block_cipher,
@@ -31,7 +51,7 @@ exe = EXE(
     debug=False,
     bootloader_ignore_signals=False,
     strip=False,
-    upx=True,
+    upx=UPX,
     console=True,
     disable_windowed_traceback=False,
     argv_emulation=False,
@@ -45,7 +65,7 @@ coll = COLLECT(
     a.zipfiles,
     a.datas,
     strip=False,
-    upx=True,
-    upx_exclude=[],
+    upx=UPX,
+    upx_exclude=UPX_EXCLUDE,
     name='pos',
 )
@@ -0,0 +1,163 @@
+import argparse
+import csv
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Iterable, Iterator
+from urllib.parse import urljoin
+
+# 3rd party imports
+import requests
+
+# Local imports
+from api import API_URL, ApiSession, iter_json_array, prepare_photo, upload_photo
+from report import build_report, iter_orders, to_html, write_csv
+
+DEFAULT_WORKERS = 8
+PATRON_FIELDS = ['id', 'name', 'balance', 'photo', 'orders']
+ORDER_ITEM_FIELDS = ['order_id', 'patron', 'created', 'settled', 'order_total', 'item_id', 'drink', 'quantity',
+                     'item_total']
+
+
+# Rows of {'name': ..., 'photo': optional path} from a CSV with a header row or a JSON list of objects
+def read_patrons(path: Path) -> Iterator[dict]:
+    with path.open(newline='', encoding='utf-8') as file:
+        rows = json.load(file) if path.suffix.lower() == '.json' else csv.DictReader(file)
+
+        for row in rows:
+            name = (row.get('name') or '').strip()
+            if name:
+                photo = (row.get('photo') or '').strip()
+                yield {'name': name, 'photo': (path.parent / photo) if photo else None}
+
+
+def import_patron(session: requests.Session, api_url: str, row: dict) -> str:
+    response = session.post(urljoin(api_url, 'patrons'), data={'name': row['name']})
+    response.raise_for_status()
+    patron = response.json()
+
+    if row['photo'] is not None:
+        response = upload_photo(session, api_url, patron['id'], prepare_photo(row['photo']))
+        response.raise_for_status()
+
+    return row['name']
+
+
+def import_patrons(args) -> int:
+    session = ApiSession()
+    adapter = requests.adapters.HTTPAdapter(pool_maxsize=args.workers)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+
+    # Names are unique, same check as adding a patron from the GUI
+    existing = {p['name'] for p in session.get(urljoin(args.api_url, 'patrons')).json()}
+    rows, skipped = [], 0
+    for row in read_patrons(args.file):
+        if row['name'] in existing:
+            skipped += 1
+            continue
+        existing.add(row['name'])
+        rows.append(row)
+
+    failures = 0
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = {executor.submit(import_patron, session, args.api_url, row): row for row in rows}
+        for future in as_completed(futures):
+            try:
+                print(f'Imported {future.result()}')
+            except (requests.RequestException, OSError) as e:
+                failures += 1
+                print(f'Failed to import {futures[future]["name"]}: {e}', file=sys.stderr)
+
+    print(f'{len(rows) - failures} imported, {skipped} already existed, {failures} failed')
+    return 1 if failures else 0
+
+
+def patron_rows(patrons: Iterable[dict]) -> Iterator[dict]:
+    for patron in patrons:
+        yield {'id': patron['id'], 'name': patron['name'], 'balance': patron['balance'], 'photo': patron['photo'],
+               'orders': len(patron['orders'])}
+
+
+# One flat row per order item, which loads straight into a dataframe/parquet table
+def order_item_rows(patrons: Iterable[dict]) -> Iterator[dict]:
+    for patron in patrons:
+        for order in patron['orders']:
+            for item in order['order_items']:
+                yield {'order_id': order['id'], 'patron': patron['name'], 'created': order['created'],
+                       'settled': order['settled'], 'order_total': order['total'], 'item_id': item['id'],
+                       'drink': item['drink'], 'quantity': item['quantity'], 'item_total': item['total']}
+
+
+def write_rows(rows: Iterable[dict], fields: list[str], output_format: str, output):
+    if output_format == 'csv':
+        writer = csv.DictWriter(output, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(rows)
+    else:
+        for row in rows:
+            output.write(json.dumps(row) + '\n')
+
+
+# Patrons are written out as they are parsed, so the whole list is never held in memory
+def export(args) -> int:
+    with ApiSession().get(urljoin(args.api_url, 'patrons'), stream=True) as response:
+        response.raise_for_status()
+        patrons = iter_json_array(response)
+
+        if args.what == 'patrons':
+            rows, fields = patron_rows(patrons), PATRON_FIELDS
+        else:
+            rows, fields = order_item_rows(patrons), ORDER_ITEM_FIELDS
+
+        if args.output is None:
+            write_rows(rows, fields, args.format, sys.stdout)
+        else:
+            with args.output.open('w', newline='', encoding='utf-8') as output:
+                write_rows(rows, fields, args.format, output)
+    return 0
+
+
+def report(args) -> int:
+    settlement = build_report(iter_orders(ApiSession(), args.api_url))
+
+    output = sys.stdout if args.output is None else args.output.open('w', newline='', encoding='utf-8')
+    try:
+        if args.format == 'csv':
+            write_csv(settlement, output)
+        else:
+            output.write(to_html(settlement))
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    return 0
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description='Headless patron administration for the POS')
+    parser.add_argument('--api-url', default=API_URL)
+    subparsers = parser.add_subparsers(required=True)
+
+    import_parser = subparsers.add_parser('import', help='bulk import patrons (and photos) from CSV or JSON')
+    import_parser.add_argument('file', type=Path, help='name and optional photo (relative to the file) per row')
+    import_parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+    import_parser.set_defaults(func=import_patrons)
+
+    export_parser = subparsers.add_parser('export', help='export patrons or order items')
+    export_parser.add_argument('what', choices=['patrons', 'orders'])
+    export_parser.add_argument('--format', choices=['csv', 'jsonl'], default='csv')
+    export_parser.add_argument('-o', '--output', type=Path, help='defaults to stdout')
+    export_parser.set_defaults(func=export)
+
+    report_parser = subparsers.add_parser('report', help='end of night settlement report')
+    report_parser.add_argument('--format', choices=['csv', 'html'], default='csv')
+    report_parser.add_argument('-o', '--output', type=Path, help='defaults to stdout')
+    report_parser.set_defaults(func=report)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,66 @@
+import math
+import time
+
+from PyQt6.QtCore import QObject, QTimer, QEvent
+from PyQt6.QtWidgets import QApplication
+
+# Selections count half as much after this many seconds
+SELECTION_HALF_LIFE = 30 * 60
+IDLE_INTERVAL = 500
+IDLE_DELAY = 2.0
+
+INPUT_EVENTS = {
+    QEvent.Type.MouseButtonPress, QEvent.Type.MouseButtonRelease, QEvent.Type.MouseMove, QEvent.Type.KeyPress,
+    QEvent.Type.TouchBegin, QEvent.Type.TouchUpdate, QEvent.Type.TouchEnd, QEvent.Type.Wheel,
+}
+
+
+# Frecency of patron selections: every selection adds one, and scores decay exponentially with time
+class PatronRanking:
+    def __init__(self, half_life: float = SELECTION_HALF_LIFE):
+        self.decay = math.log(2) / half_life
+        self.scores: dict[int, tuple[float, float]] = {}
+
+    def score(self, patron_id: int, now: float | None = None) -> float:
+        if patron_id not in self.scores:
+            return 0.0
+        score, updated = self.scores[patron_id]
+        return score * math.exp(-self.decay * ((now or time.monotonic()) - updated))
+
+    def record(self, patron_id: int):
+        now = time.monotonic()
+        self.scores[patron_id] = self.score(patron_id, now) + 1, now
+
+    def top(self, count: int) -> list[int]:
+        now = time.monotonic()
+        return sorted(self.scores, key=lambda patron_id: self.score(patron_id, now), reverse=True)[:count]
+
+
+# Calls back on a timer, but only once nobody has touched the screen for a while
+class IdleScheduler(QObject):
+    def __init__(self, parent: QObject, callback, interval: int = IDLE_INTERVAL, idle_delay: float = IDLE_DELAY):
+        super().__init__(parent)
+        self.callback = callback
+        self.idle_delay = idle_delay
+        self.last_input = time.monotonic()
+
+        QApplication.instance().installEventFilter(self)
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.tick)
+        self.timer.start(interval)
+
+    def eventFilter(self, watched: QObject, event: QEvent) -> bool:
+        if event.type() in INPUT_EVENTS:
+            self.last_input = time.monotonic()
+        return False
+
+    def tick(self):
+        if time.monotonic() - self.last_input >= self.idle_delay:
+            self.callback()
+
+    def pause(self):
+        self.timer.stop()
+
+    def resume(self):
+        self.timer.start()
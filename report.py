@@ -0,0 +1,117 @@
+import csv
+import html
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Iterable, Iterator, TextIO
+from urllib.parse import urljoin
+
+import requests
+
+PAGE_SIZE = 500
+
+
+@dataclass
+class Report:
+    # (drink, quantity, revenue) sorted by revenue
+    by_drink: list[tuple[str, int, float]]
+    # (patron, revenue, outstanding) sorted by revenue
+    by_patron: list[tuple[str, float, float]]
+    # (hour, revenue) in time order
+    by_hour: list[tuple[datetime, float]]
+    revenue: float
+    outstanding: float
+    orders: int
+
+
+# Every order, page by page. Works with both a paginated ({'results': [...], 'next': url}) and a plain list response
+def iter_orders(session: requests.Session, api_url: str) -> Iterator[dict]:
+    url = urljoin(api_url, 'orders')
+    params = {'page_size': PAGE_SIZE}
+    while url:
+        response = session.get(url, params=params)
+        response.raise_for_status()
+        page = response.json()
+        if isinstance(page, list):
+            yield from page
+            return
+
+        yield from page['results']
+        url, params = page.get('next'), None
+
+
+# Aggregates in a single pass while the orders stream in from iter_orders, so only the running totals are kept in memory
+def build_report(orders: Iterable[dict]) -> Report:
+    drink_quantity: dict[str, int] = defaultdict(int)
+    drink_revenue: dict[str, float] = defaultdict(float)
+    patron_revenue: dict[str, float] = defaultdict(float)
+    patron_outstanding: dict[str, float] = defaultdict(float)
+    hour_revenue: dict[datetime, float] = defaultdict(float)
+    count = 0
+
+    for order in orders:
+        count += 1
+        created = order['created']
+        if isinstance(created, str):
+            created = datetime.fromisoformat(created)
+
+        patron = order['patron']
+        total = sum(item['total'] for item in order['order_items'])
+        for item in order['order_items']:
+            drink_quantity[item['drink']] += item['quantity']
+            drink_revenue[item['drink']] += item['total']
+        patron_revenue[patron] += total
+        hour_revenue[created.replace(minute=0, second=0, microsecond=0)] += total
+        if not order['settled']:
+            patron_outstanding[patron] += total
+
+    by_drink = sorted(((name, drink_quantity[name], revenue) for name, revenue in drink_revenue.items()),
+                      key=lambda row: row[2], reverse=True)
+    by_patron = sorted(((name, revenue, patron_outstanding[name]) for name, revenue in patron_revenue.items()),
+                       key=lambda row: row[1], reverse=True)
+    by_hour = sorted(hour_revenue.items())
+
+    return Report(by_drink, by_patron, by_hour, sum(drink_revenue.values()), sum(patron_outstanding.values()), count)
+
+
+def write_csv(report: Report, output: TextIO):
+    writer = csv.writer(output)
+    writer.writerow(['Orders', report.orders])
+    writer.writerow(['Revenue', f'{report.revenue:.2f}'])
+    writer.writerow(['Outstanding', f'{report.outstanding:.2f}'])
+
+    writer.writerow([])
+    writer.writerow(['Drink', 'Quantity', 'Revenue'])
+    writer.writerows((name, quantity, f'{revenue:.2f}') for name, quantity, revenue in report.by_drink)
+
+    writer.writerow([])
+    writer.writerow(['Patron', 'Revenue', 'Outstanding'])
+    writer.writerows((name, f'{revenue:.2f}', f'{outstanding:.2f}') for name, revenue, outstanding in report.by_patron)
+
+    writer.writerow([])
+    writer.writerow(['Hour', 'Revenue'])
+    writer.writerows((hour.isoformat(timespec='minutes'), f'{revenue:.2f}') for hour, revenue in report.by_hour)
+
+
+def _html_table(headers: list[str], rows: Iterable[Iterable]) -> str:
+    head = ''.join(f'<th>{html.escape(h)}</th>' for h in headers)
+    body = ''.join('<tr>' + ''.join(f'<td>{html.escape(str(cell))}</td>' for cell in row) + '</tr>' for row in rows)
+    return f'<table cellpadding="6"><tr>{head}</tr>{body}</table>'
+
+
+def to_html(report: Report) -> str:
+    return ''.join([
+        '<h1>Settlement Report</h1>',
+        f'<p>{report.orders} orders, revenue ${report.revenue:.2f}, outstanding ${report.outstanding:.2f}</p>',
+        '<h2>Outstanding Balances</h2>',
+        _html_table(['Patron', 'Outstanding'],
+                    ((name, f'${outstanding:.2f}') for name, _, outstanding in report.by_patron if outstanding)),
+        '<h2>Revenue per Drink</h2>',
+        _html_table(['Drink', 'Quantity', 'Revenue'],
+                    ((name, quantity, f'${revenue:.2f}') for name, quantity, revenue in report.by_drink)),
+        '<h2>Revenue per Patron</h2>',
+        _html_table(['Patron', 'Revenue'], ((name, f'${revenue:.2f}') for name, revenue, _ in report.by_patron)),
+        '<h2>Revenue per Hour</h2>',
+        _html_table(['Hour', 'Revenue'],
+                    ((hour.strftime('%a %H:00'), f'${revenue:.2f}') for hour, revenue in report.by_hour)),
+    ])
@@ -0,0 +1,96 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from enum import IntEnum
+
+import metrics
+
+
+class Priority(IntEnum):
+    # Taps that change a tab
+    WRITE = 0
+    # Something the bartender is waiting to see
+    READ = 1
+    # Sync, prefetch and pictures
+    BACKGROUND = 2
+
+
+CONCURRENCY = {Priority.WRITE: 2, Priority.READ: 2, Priority.BACKGROUND: 2}
+# Seconds shutdown waits for the workers, anything still running after that is left to die with the process
+SHUTDOWN_TIMEOUT = 5.0
+
+
+# Worker threads shared by every class of network work. Queued tasks start highest priority first, and each class only
+# gets its own share of the workers, so background work never holds up a tap. Cancelling a task's future before it
+# starts drops it
+class NetworkScheduler:
+    def __init__(self, concurrency: dict[Priority, int] = CONCURRENCY):
+        self.concurrency = dict(concurrency)
+        self.running = dict.fromkeys(self.concurrency, 0)
+        self.queues: dict[Priority, deque] = {priority: deque() for priority in self.concurrency}
+        self.condition = threading.Condition()
+        self.stopped = False
+
+        self.workers = [threading.Thread(target=self.work, name=f'network-{i}', daemon=True)
+                        for i in range(sum(self.concurrency.values()))]
+        for worker in self.workers:
+            worker.start()
+
+    def submit(self, fn, *args, priority: Priority = Priority.BACKGROUND, **kwargs) -> Future:
+        future = Future()
+        with self.condition:
+            if self.stopped:
+                raise RuntimeError('Cannot schedule new work after shutdown')
+            self.queues[priority].append((future, fn, args, kwargs, time.perf_counter()))
+            self.condition.notify()
+        return future
+
+    # Called with the condition held
+    def next_task(self) -> tuple[Priority, tuple] | None:
+        for priority in sorted(self.queues):
+            queue = self.queues[priority]
+            while queue and queue[0][0].cancelled():
+                queue.popleft()
+            if queue and self.running[priority] < self.concurrency[priority]:
+                return priority, queue.popleft()
+        return None
+
+    def work(self):
+        while True:
+            with self.condition:
+                while (task := self.next_task()) is None:
+                    if self.stopped:
+                        return
+                    self.condition.wait()
+                priority, (future, fn, args, kwargs, queued_at) = task
+                self.running[priority] += 1
+
+            try:
+                if future.set_running_or_notify_cancel():
+                    metrics.record('scheduler.wait', time.perf_counter() - queued_at, priority=priority.name.lower())
+                    try:
+                        result = fn(*args, **kwargs)
+                    except BaseException as e:
+                        future.set_exception(e)
+                    else:
+                        future.set_result(result)
+            finally:
+                with self.condition:
+                    self.running[priority] -= 1
+                    self.condition.notify_all()
+
+    # Reads and background work still waiting are dropped, writes already queued are given until the timeout to go
+    # out. The workers are daemon threads, so a slow download doesn't keep the process alive either
+    def shutdown(self, timeout: float = SHUTDOWN_TIMEOUT):
+        with self.condition:
+            for priority, queue in self.queues.items():
+                if priority != Priority.WRITE:
+                    for future, *_ in queue:
+                        future.cancel()
+            self.stopped = True
+            self.condition.notify_all()
+
+        deadline = time.monotonic() + timeout
+        for worker in self.workers:
+            worker.join(max(deadline - time.monotonic(), 0))
@@ -1 +1 @@
-from .settle_up_dialog import SettleUpDialog
+from .settle_up_dialog import SettleUpDialog, payment_note, render_payment_qr
@@ -1,3 +1,7 @@
+import io
+from functools import lru_cache
+from urllib.parse import urlencode
+
 from PyQt6.QtWidgets import QDialog
 from PyQt6.QtCore import Qt
 from PyQt6.QtGui import QImage, QPixmap
@@ -6,6 +10,31 @@ from utilities import resource_path
 from .settle_up_dialog_init import Ui_settle_up_dialog
 
 QR_CODE_PATH = resource_path('venmo_qrcode.png').as_posix()
+# What venmo_qrcode.png encodes, the payment QR adds the amount and note to it
+VENMO_URL = 'https://venmo.com/code?user_id=2176502074441728132'
+PAYMENT_NOTE = 'House party tab'
+QR_CACHE_SIZE = 32
+
+
+def payment_note(patron_name: str) -> str:
+    return f'{PAYMENT_NOTE} - {patron_name}'
+
+
+def payment_url(cents: int, note: str) -> str:
+    return f'{VENMO_URL}&{urlencode({"txn": "pay", "amount": f"{cents / 100:.2f}", "note": note})}'
+
+
+# Keyed by amount in cents (not a float total) and width. Safe to call from a worker thread to pre-render
+@lru_cache(maxsize=QR_CACHE_SIZE)
+def render_payment_qr(cents: int, note: str, width: int) -> QImage:
+    import segno
+
+    qr_code = segno.make(payment_url(cents, note), error='m')
+    buffer = io.BytesIO()
+    qr_code.save(buffer, kind='png', scale=max(1, width // qr_code.symbol_size()[0]))
+
+    # Modules are square blocks, nearest neighbour keeps their edges sharp
+    return QImage.fromData(buffer.getvalue()).scaledToWidth(width, Qt.TransformationMode.FastTransformation)
 
 
 class SettleUpDialog(QDialog):
@@ -27,6 +56,12 @@ class SettleUpDialog(QDialog):
         self.ui.button_box.accepted.connect(self.accept)
         self.ui.button_box.rejected.connect(self.reject)
 
+    # Show the total with a QR code that pays exactly that amount
+    def set_total(self, total: float, note: str):
+        self.ui.total_label.setText(f'Total: ${total:.2f}')
+        image = render_payment_qr(round(total * 100), note, self.width())
+        self.ui.qr_code_label.setPixmap(QPixmap.fromImage(image))
+
     def settle_up(self):
        print('accepted')
        self.accept()
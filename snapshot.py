@@ -0,0 +1,76 @@
+import logging
+import pickle
+from dataclasses import dataclass
+
+import image_pack
+from drink import Drink
+from order import Order, OrderItem
+from patron import Patron
+from utilities import data_path
+
+SNAPSHOT_FILE = 'snapshot.pickle'
+SNAPSHOT_VERSION = 1
+SNAPSHOT_INTERVAL = 5 * 60 * 1000
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Snapshot:
+    patrons: list[Patron]
+    drinks: list[Drink]
+    sound_files: list[str]
+
+
+# Everything is flattened to plain tuples so the file doesn't depend on class layout (or on Qt objects)
+def _order_state(order: Order) -> tuple:
+    items = [(item.id, item.drink, item.price, item.quantity) for item in order.order_items]
+    return order.id, items, order.total, order.patron, order.settled, order.created, order.version
+
+
+def _order_from_state(state: tuple) -> Order:
+    order_id, items, total, patron, settled, created, version = state
+    return Order(order_id, [OrderItem(*item) for item in items], total, patron, settled, created, version)
+
+
+def save_snapshot(patrons: list[Patron], drinks: list[Drink], sound_files: list[str]):
+    state = (
+        SNAPSHOT_VERSION,
+        [(p.id, p.name, [_order_state(o) for o in p.orders], p.balance, p.photo) for p in patrons],
+        [(d.id, d.name, d.description, d.price, d.photo_url, d.in_stock, d.categories) for d in drinks],
+        sound_files,
+    )
+
+    # Write next to the real file and swap, so a crash mid-write never leaves a truncated snapshot
+    path = data_path(SNAPSHOT_FILE)
+    temp_path = path.with_suffix('.tmp')
+    temp_path.write_bytes(pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL))
+    temp_path.replace(path)
+
+
+def load_snapshot() -> Snapshot | None:
+    path = data_path(SNAPSHOT_FILE)
+    if not path.exists():
+        return None
+
+    try:
+        version, patrons_state, drinks_state, sound_files = pickle.loads(path.read_bytes())
+    except (pickle.UnpicklingError, EOFError, ValueError, TypeError):
+        logger.warning('Ignoring unreadable snapshot %s', path)
+        return None
+
+    if version != SNAPSHOT_VERSION:
+        return None
+
+    patrons = []
+    for patron_id, name, orders, balance, photo in patrons_state:
+        patrons.append(Patron(patron_id, name, [_order_from_state(o) for o in orders], balance, photo))
+
+    # Drinks are only restored if their thumbnail is still packed, the reconcile will bring back the rest
+    drinks = []
+    for drink_id, name, description, price, photo_url, in_stock, categories in drinks_state:
+        thumbnail = image_pack.load(photo_url)
+        if thumbnail is not None:
+            drinks.append(Drink(drink_id, name, description, price, thumbnail, in_stock, categories, photo_url))
+
+    return Snapshot(patrons, drinks, sound_files)
@@ -0,0 +1,339 @@
+from functools import wraps
+
+from PyQt6.QtCore import QObject, QThread, QTimer, pyqtSignal
+
+from drink import Drink
+from order import Order, OrderItem
+from patron import Patron
+
+
+# Calls made on any other thread are queued to the thread the store lives on, so background work can hand its results
+# straight to the store. Queued calls return None
+def on_store_thread(method):
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if QThread.currentThread() != self.thread():
+            self.call_requested.emit(lambda: method(self, *args, **kwargs))
+            return None
+        return method(self, *args, **kwargs)
+    return wrapper
+
+
+# Added, changed and removed since the last flush. Something added and removed again before the flush is never
+# signalled at all, and a change to something just added is part of its addition
+class Changes:
+    def __init__(self):
+        self.added: dict[int, object] = {}
+        self.changed: dict[int, object] = {}
+        self.removed: dict[int, object] = {}
+
+    def __bool__(self):
+        return bool(self.added or self.changed or self.removed)
+
+    def add(self, value):
+        if self.removed.pop(id(value), None) is not None:
+            self.changed[id(value)] = value
+        else:
+            self.added[id(value)] = value
+
+    def change(self, value):
+        if id(value) not in self.added and id(value) not in self.removed:
+            self.changed[id(value)] = value
+
+    def remove(self, value):
+        if self.added.pop(id(value), None) is None:
+            self.changed.pop(id(value), None)
+            self.removed[id(value)] = value
+
+    def take(self) -> tuple[list, list, list]:
+        changes = list(self.added.values()), list(self.changed.values()), list(self.removed.values())
+        self.added, self.changed, self.removed = {}, {}, {}
+        return changes
+
+
+# Patrons, their orders, the cart, the menu and who is being served. Everything that changes them goes through here,
+# and views repaint from the signals instead of redrawing whole regions. Signals are held back and go out together at
+# the end of the event loop tick, so a burst of changes (a sync, ordering the usual) repaints once, and only what
+# actually changed
+class Store(QObject):
+    patrons_added = pyqtSignal(list)
+    patrons_removed = pyqtSignal(list)
+    # Renamed or given a new picture
+    patrons_changed = pyqtSignal(list)
+    menu_changed = pyqtSignal(list)
+    active_patron_changed = pyqtSignal(object)
+    # (patron, order) for a patron's new order
+    order_added = pyqtSignal(object, object)
+    # (order, items)
+    order_items_added = pyqtSignal(object, list)
+    order_items_changed = pyqtSignal(object, list)
+    order_items_removed = pyqtSignal(object, list)
+    order_settled = pyqtSignal(object)
+    cart_items_added = pyqtSignal(list)
+    cart_items_changed = pyqtSignal(list)
+    cart_items_removed = pyqtSignal(list)
+    # Calls from other threads, see on_store_thread
+    call_requested = pyqtSignal(object)
+
+    def __init__(self, parent: QObject):
+        super().__init__(parent)
+        self.patrons: list[Patron] = []
+        # id() of every patron in patrons
+        self.patron_ids: set[int] = set()
+        self.drinks: list[Drink] = []
+        self.cart: list[OrderItem] = []
+        self.active_patron: Patron | None = None
+
+        self.patron_changes = Changes()
+        self.menu_dirty = False
+        self.active_patron_dirty = False
+        self.added_orders: list[tuple[Patron, Order]] = []
+        # Order id() to (order, its item changes)
+        self.order_changes: dict[int, tuple[Order, Changes]] = {}
+        self.settled_orders: dict[int, Order] = {}
+        self.cart_changes = Changes()
+
+        self.flush_scheduled = False
+        self.call_requested.connect(self.call)
+
+    def call(self, fn):
+        fn()
+
+    def changed(self):
+        if not self.flush_scheduled:
+            self.flush_scheduled = True
+            QTimer.singleShot(0, self.flush)
+
+    # New patrons go out first, so a view handling the removals can already lay out everyone that's left
+    def flush(self):
+        self.flush_scheduled = False
+
+        added, changed, removed = self.patron_changes.take()
+        if added:
+            self.patrons_added.emit(added)
+        if removed:
+            self.patrons_removed.emit(removed)
+        if changed:
+            self.patrons_changed.emit(changed)
+
+        if self.menu_dirty:
+            self.menu_dirty = False
+            self.menu_changed.emit(self.drinks)
+
+        if self.active_patron_dirty:
+            self.active_patron_dirty = False
+            self.active_patron_changed.emit(self.active_patron)
+
+        added_orders, self.added_orders = self.added_orders, []
+        for patron, order in added_orders:
+            self.order_added.emit(patron, order)
+
+        order_changes, self.order_changes = self.order_changes, {}
+        for order, changes in order_changes.values():
+            added, changed, removed = changes.take()
+            if added:
+                self.order_items_added.emit(order, added)
+            if changed:
+                self.order_items_changed.emit(order, changed)
+            if removed:
+                self.order_items_removed.emit(order, removed)
+
+        settled_orders, self.settled_orders = self.settled_orders, {}
+        for order in settled_orders.values():
+            self.order_settled.emit(order)
+
+        added, changed, removed = self.cart_changes.take()
+        if added:
+            self.cart_items_added.emit(added)
+        if changed:
+            self.cart_items_changed.emit(changed)
+        if removed:
+            self.cart_items_removed.emit(removed)
+
+    ####################################################################################################################
+    # Patrons
+    ####################################################################################################################
+
+    @on_store_thread
+    def add_patrons(self, patrons: list[Patron]):
+        for patron in patrons:
+            self.patrons.append(patron)
+            self.patron_ids.add(id(patron))
+            self.patron_changes.add(patron)
+        self.changed()
+
+    @on_store_thread
+    def remove_patron(self, patron: Patron):
+        self.patrons.remove(patron)
+        self.patron_ids.discard(id(patron))
+        self.patron_changes.remove(patron)
+        if patron is self.active_patron:
+            self.select_patron(None)
+        self.changed()
+
+    # Replaces the whole list, e.g. after a sync. Patrons already here have to be passed as the same objects
+    @on_store_thread
+    def set_patrons(self, patrons: list[Patron]):
+        kept = {id(patron) for patron in patrons}
+        for patron in self.patrons:
+            if id(patron) not in kept:
+                self.patron_changes.remove(patron)
+                if patron is self.active_patron:
+                    self.select_patron(None)
+
+        current = {id(patron) for patron in self.patrons}
+        for patron in patrons:
+            if id(patron) not in current:
+                self.patron_changes.add(patron)
+
+        self.patrons = patrons
+        self.patron_ids = kept
+        self.changed()
+
+    # Patrons no longer here are ignored, e.g. removed by a sync while their edit dialog was open
+    @on_store_thread
+    def update_patron(self, patron: Patron, name: str, photo: str | None):
+        if id(patron) in self.patron_ids and (patron.name, patron.photo) != (name, photo):
+            patron.name, patron.photo = name, photo
+            self.patron_changes.change(patron)
+            self.changed()
+
+    @on_store_thread
+    def select_patron(self, patron: Patron | None):
+        self.active_patron = patron
+        self.active_patron_dirty = True
+        self.clear_cart()
+        self.changed()
+
+    ####################################################################################################################
+    # Orders
+    ####################################################################################################################
+
+    def item_changes(self, order: Order) -> Changes:
+        if id(order) not in self.order_changes:
+            self.order_changes[id(order)] = order, Changes()
+        return self.order_changes[id(order)][1]
+
+    # Brings an order up to date with a copy from the server. The order and the items that are still on it stay the
+    # same objects, so anything holding on to them (tab rows, the prefetched tabs) stays valid
+    def merge_order(self, order: Order, latest: Order):
+        changes = self.item_changes(order)
+        items = {item.id: item for item in order.order_items}
+        merged = []
+        for latest_item in latest.order_items:
+            item = items.pop(latest_item.id, None)
+            if item is None:
+                changes.add(latest_item)
+                merged.append(latest_item)
+                continue
+
+            if (item.drink, item.price, item.quantity) != (latest_item.drink, latest_item.price, latest_item.quantity):
+                item.drink, item.price, item.quantity = latest_item.drink, latest_item.price, latest_item.quantity
+                changes.change(item)
+            merged.append(item)
+
+        for item in items.values():
+            changes.remove(item)
+
+        if latest.settled and not order.settled:
+            self.settled_orders[id(order)] = order
+        order.__dict__.update(latest.__dict__, order_items=merged)
+        self.changed()
+
+    # Adds the patron's order, or merges it into the copy already here unless that one is newer
+    @on_store_thread
+    def update_order(self, patron: Patron, latest: Order):
+        order = next((order for order in patron.orders if order.id == latest.id), None)
+        if order is None:
+            patron.orders.append(latest)
+            self.added_orders.append((patron, latest))
+            self.changed()
+        elif latest.version >= order.version:
+            self.merge_order(order, latest)
+
+    # Replaces all of a patron's orders, e.g. after a sync, merging into the orders already here. An order edited here
+    # since the sync fetched it is newer than the copy passed in and is kept as it is
+    @on_store_thread
+    def set_orders(self, patron: Patron, orders: list[Order]):
+        current = {order.id: order for order in patron.orders}
+        updated = []
+        for latest in orders:
+            order = current.get(latest.id)
+            if order is None:
+                self.added_orders.append((patron, latest))
+                updated.append(latest)
+            else:
+                if order is not latest and latest.version >= order.version:
+                    self.merge_order(order, latest)
+                updated.append(order)
+        patron.orders = updated
+        self.changed()
+
+    # A sync may have taken the item off already by the time a removal sent from the scheduler gets here
+    @on_store_thread
+    def remove_order_item(self, order: Order, item: OrderItem, version: int):
+        if item not in order.order_items:
+            return
+        order.order_items.remove(item)
+        order.version = version
+        self.item_changes(order).remove(item)
+        self.changed()
+
+    @on_store_thread
+    def settle_order(self, order: Order):
+        if not order.settled:
+            order.settled = True
+            self.settled_orders[id(order)] = order
+            self.changed()
+
+    ####################################################################################################################
+    # Cart
+    ####################################################################################################################
+
+    @on_store_thread
+    def add_to_cart(self, drink: Drink):
+        for item in self.cart:
+            if item.drink == drink.name:
+                self.set_cart_quantity(item, item.quantity + 1)
+                return
+
+        item = OrderItem(len(self.cart), drink.name, drink.price, 1)
+        self.cart.append(item)
+        self.cart_changes.add(item)
+        self.changed()
+
+    @on_store_thread
+    def set_cart_quantity(self, item: OrderItem, quantity: int):
+        item.quantity = max(quantity, 1)
+        self.cart_changes.change(item)
+        self.changed()
+
+    @on_store_thread
+    def remove_from_cart(self, item: OrderItem):
+        self.cart.remove(item)
+        self.cart_changes.remove(item)
+        self.changed()
+
+    @on_store_thread
+    def clear_cart(self):
+        for item in self.cart:
+            self.cart_changes.remove(item)
+        self.cart.clear()
+        self.changed()
+
+    ####################################################################################################################
+    # Menu
+    ####################################################################################################################
+
+    # Only signalled if anything shown on the menu changed
+    @on_store_thread
+    def set_menu(self, drinks: list[Drink]):
+        def drink_key(drink: Drink):
+            return drink.id, drink.name, drink.price, drink.photo_url
+
+        if self.drinks and list(map(drink_key, drinks)) == list(map(drink_key, self.drinks)):
+            return
+
+        self.drinks = drinks
+        self.menu_dirty = True
+        self.changed()
@@ -56,7 +56,7 @@ class Ui_tab_row_template(object):
         font = QtGui.QFont()
         font.setPointSize(16)
         self.remove_button.setFont(font)
-        self.remove_button.setStyleSheet("padding: 10px 20px")
+        self.remove_button.setProperty("buttonRole", "remove")
         self.remove_button.setObjectName("remove_button")
         self.horizontalLayout_2.addWidget(self.remove_button)
         spacerItem1 = QtWidgets.QSpacerItem(40, 20, QtWidgets.QSizePolicy.Policy.Expanding, QtWidgets.QSizePolicy.Policy.Minimum)
@@ -0,0 +1,99 @@
+import json
+import random
+
+import pytest
+
+from api import iter_json_array
+
+
+class FakeResponse:
+    def __init__(self, body: bytes, chunk_sizes: list[int], encoding: str | None = 'utf-8'):
+        self.body = body
+        self.chunk_sizes = chunk_sizes
+        self.encoding = encoding
+
+    def iter_content(self, chunk_size: int):
+        sizes = iter(self.chunk_sizes)
+        position = 0
+        while position < len(self.body):
+            size = next(sizes, chunk_size)
+            yield self.body[position:position + size]
+            position += size
+
+
+def decode(body: bytes, chunk_size: int) -> list:
+    return list(iter_json_array(FakeResponse(body, []), chunk_size))
+
+
+# Strings full of the characters that matter to the scanner: quotes, backslashes, brackets and multibyte ones
+def random_string(rng: random.Random) -> str:
+    return ''.join(rng.choice('ab {}[],:"\\/\n\té€😀') for _ in range(rng.randrange(16)))
+
+
+def random_value(rng: random.Random, depth: int = 0):
+    kind = rng.randrange(6 if depth < 3 else 3)
+    if kind == 0:
+        return rng.choice([rng.randrange(-10 ** 9, 10 ** 9), rng.random() * 10 ** rng.randrange(-5, 10)])
+    if kind == 1:
+        return rng.choice([True, False, None])
+    if kind in (2, 3):
+        return random_string(rng)
+    if kind == 4:
+        return [random_value(rng, depth + 1) for _ in range(rng.randrange(4))]
+    return {random_string(rng): random_value(rng, depth + 1) for _ in range(rng.randrange(4))}
+
+
+@pytest.mark.parametrize('seed', range(50))
+def test_matches_json_loads_for_any_chunking(seed):
+    rng = random.Random(seed)
+    values = [random_value(rng) for _ in range(rng.randrange(8))]
+    body = json.dumps(values, ensure_ascii=seed % 2 == 0, indent=1 if seed % 3 == 0 else None).encode()
+
+    for chunk_size in (1, 2, 3, 5, 8, 64, len(body) + 1):
+        assert decode(body, chunk_size) == values
+    sizes = [rng.randrange(1, 10) for _ in range(len(body))]
+    assert list(iter_json_array(FakeResponse(body, sizes))) == values
+
+
+@pytest.mark.parametrize('chunk_size', range(1, 12))
+def test_escapes_across_chunk_boundaries(chunk_size):
+    values = ['\\', '"', '\\"', 'a\\\\"b', {'"\\': ['\\', '"]}']}]
+    assert decode(json.dumps(values).encode(), chunk_size) == values
+
+
+@pytest.mark.parametrize('chunk_size', range(1, 6))
+def test_multibyte_utf8_split_across_chunks(chunk_size):
+    values = ['é', '€uro', '😀', {'naïve': 'café'}]
+    assert decode(json.dumps(values, ensure_ascii=False).encode(), chunk_size) == values
+
+
+@pytest.mark.parametrize('chunk_size', range(1, 6))
+def test_top_level_scalars(chunk_size):
+    # A number cut off at a chunk boundary isn't decoded until it is complete
+    body = b'[12345, -6.5e3 ,true,false, null, "s", 0]'
+    assert decode(body, chunk_size) == [12345, -6500.0, True, False, None, 's', 0]
+
+
+@pytest.mark.parametrize('body', [b'', b'  ', b'[', b'[1,2', b'[{"a": 1}', b'[{"a": 1}, ', b'["abc', b'[123'])
+@pytest.mark.parametrize('chunk_size', [1, 3, 64])
+def test_truncated_array(body, chunk_size):
+    with pytest.raises(ValueError, match='Truncated'):
+        decode(body, chunk_size)
+
+
+def test_not_an_array():
+    with pytest.raises(ValueError, match='Expected a JSON array'):
+        decode(b'{"a": 1}', 4)
+
+
+def test_elements_are_yielded_as_they_arrive():
+    elements = iter_json_array(FakeResponse(b'[{"a": 1}, {"b": 2}, {"c"', [10, 10, 4]))
+    assert next(elements) == {'a': 1}
+    assert next(elements) == {'b': 2}
+    with pytest.raises(ValueError):
+        next(elements)
+
+
+def test_large_element_in_small_chunks():
+    values = [{'name': 'x' * 200_000, 'orders': list(range(20_000))}, 1]
+    assert decode(json.dumps(values).encode(), 512) == values
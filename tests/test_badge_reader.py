@@ -0,0 +1,100 @@
+import pytest
+from PyQt6.QtCore import QEvent, QObject, Qt
+from PyQt6.QtGui import QKeyEvent, QWindow
+from PyQt6.QtWidgets import QApplication
+
+import badge_reader
+from badge_reader import BADGE_KEY_INTERVAL, BadgeReader
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(badge_reader.time, 'monotonic', clock)
+    return clock
+
+
+@pytest.fixture
+def reader(app):
+    parent = QObject()
+    reader = BadgeReader(parent)
+    scanned = []
+    reader.badge_scanned.connect(scanned.append)
+    yield reader, scanned
+    app.removeEventFilter(reader)
+
+
+# Records the keys that get through to it
+class Window(QWindow):
+    def __init__(self):
+        super().__init__()
+        self.keys = []
+
+    def keyPressEvent(self, event: QKeyEvent):
+        self.keys.append(event.key())
+
+
+@pytest.fixture
+def window(app):
+    window = Window()
+    yield window
+    window.destroy()
+
+
+# Emulates a keyboard wedge reader (or a person) typing into the window, returns whether Enter got through
+def type_keys(window: Window, clock: Clock, text: str, interval: float) -> bool:
+    for character in text:
+        clock.now += interval
+        press = QKeyEvent(QEvent.Type.KeyPress, ord(character.upper()), Qt.KeyboardModifier.NoModifier, character)
+        QApplication.sendEvent(window, press)
+
+    clock.now += interval
+    enter = QKeyEvent(QEvent.Type.KeyPress, Qt.Key.Key_Return, Qt.KeyboardModifier.NoModifier, '\r')
+    QApplication.sendEvent(window, enter)
+    return window.keys[-1] == Qt.Key.Key_Return
+
+
+def test_burst_is_a_badge(reader, window, clock):
+    _, scanned = reader
+    assert not type_keys(window, clock, '0012345', BADGE_KEY_INTERVAL / 5)
+    assert scanned == ['0012345']
+    # The characters themselves still go through
+    assert len(window.keys) == 7
+
+
+def test_slow_typing_is_not_a_badge(reader, window, clock):
+    _, scanned = reader
+    assert type_keys(window, clock, '0012345', BADGE_KEY_INTERVAL * 3)
+    assert scanned == []
+
+
+def test_pause_before_the_burst_starts_a_new_badge(reader, window, clock):
+    _, scanned = reader
+    type_keys(window, clock, 'ab', BADGE_KEY_INTERVAL * 3)
+    clock.now += 1
+    type_keys(window, clock, '98765', BADGE_KEY_INTERVAL / 5)
+    assert scanned == ['98765']
+
+
+def test_short_burst_is_not_a_badge(reader, window, clock):
+    _, scanned = reader
+    assert type_keys(window, clock, '12', BADGE_KEY_INTERVAL / 5)
+    assert scanned == []
+
+
+def test_only_window_key_events_count(reader, clock):
+    _, scanned = reader
+    target = QObject()
+    for character in '0012345':
+        clock.now += BADGE_KEY_INTERVAL / 5
+        QApplication.sendEvent(target, QKeyEvent(QEvent.Type.KeyPress, ord(character), Qt.KeyboardModifier.NoModifier,
+                                                 character))
+    assert scanned == []
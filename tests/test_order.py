@@ -0,0 +1,90 @@
+from order import OrderItem, merge_order_items
+
+
+def item(item_id: int | None, drink: str = 'Beer', quantity: int = 1, price: float = 5.0) -> OrderItem:
+    return OrderItem(item_id, drink, price, quantity)
+
+
+def quantities(items: list[OrderItem]) -> dict:
+    return {(i.id, i.drink): i.quantity for i in items}
+
+
+def test_unchanged_on_both_sides():
+    base = [item(1), item(2, 'Wine')]
+    assert quantities(merge_order_items(base, base, base)) == {(1, 'Beer'): 1, (2, 'Wine'): 1}
+
+
+def test_concurrent_adds_keep_both():
+    base = [item(1)]
+    ours = base + [item(None, 'Wine')]
+    theirs = base + [item(2, 'Cider')]
+
+    merged = merge_order_items(base, ours, theirs)
+
+    assert quantities(merged) == {(1, 'Beer'): 1, (2, 'Cider'): 1, (None, 'Wine'): 1}
+
+
+def test_local_add_with_id_unknown_to_base():
+    base = [item(1)]
+    ours = base + [item(7, 'Wine')]
+
+    assert quantities(merge_order_items(base, ours, base)) == {(1, 'Beer'): 1, (7, 'Wine'): 1}
+
+
+def test_local_remove_of_untouched_item():
+    base = [item(1), item(2, 'Wine')]
+    ours = [item(1)]
+
+    assert quantities(merge_order_items(base, ours, base)) == {(1, 'Beer'): 1}
+
+
+def test_local_remove_loses_to_remote_quantity_change():
+    base = [item(1, quantity=2)]
+    theirs = [item(1, quantity=3)]
+
+    assert quantities(merge_order_items(base, [], theirs)) == {(1, 'Beer'): 3}
+
+
+def test_remote_remove_wins_over_local_quantity_change():
+    base = [item(1), item(2, 'Wine')]
+    ours = [item(1, quantity=4), item(2, 'Wine')]
+    theirs = [item(2, 'Wine')]
+
+    assert quantities(merge_order_items(base, ours, theirs)) == {(2, 'Wine'): 1}
+
+
+def test_concurrent_quantity_changes_are_summed():
+    base = [item(1, quantity=2)]
+    ours = [item(1, quantity=3)]
+    theirs = [item(1, quantity=5)]
+
+    assert quantities(merge_order_items(base, ours, theirs)) == {(1, 'Beer'): 6}
+
+
+def test_quantity_changes_down_to_nothing_drop_the_item():
+    base = [item(1, quantity=2)]
+    ours = [item(1, quantity=1)]
+    theirs = [item(1, quantity=1)]
+
+    assert merge_order_items(base, ours, theirs) == []
+
+
+def test_remote_price_change_is_kept():
+    base = [item(1, quantity=1)]
+    ours = [item(1, quantity=2)]
+    theirs = [item(1, quantity=1, price=6.0)]
+
+    [merged] = merge_order_items(base, ours, theirs)
+
+    assert (merged.quantity, merged.price) == (2, 6.0)
+
+
+def test_inputs_are_not_modified():
+    base = [item(1, quantity=2)]
+    ours = [item(1, quantity=3)]
+    theirs = [item(1, quantity=5)]
+
+    merged = merge_order_items(base, ours, theirs)
+
+    assert merged[0] is not theirs[0]
+    assert (base[0].quantity, ours[0].quantity, theirs[0].quantity) == (2, 3, 5)
@@ -0,0 +1,76 @@
+import pytest
+
+from patron import Patron
+from patron_index import PatronIndex
+
+
+def patron(patron_id: int, name: str) -> Patron:
+    return Patron(patron_id, name, [], 0, None)
+
+
+@pytest.fixture
+def index() -> PatronIndex:
+    index = PatronIndex()
+    for i, name in enumerate(['Ann Lee', 'Bob Ray', 'Annabel  Smith', 'Rob Ann', 'Dana Banner']):
+        index.add(patron(i, name))
+    return index
+
+
+def names(patrons: list[Patron]) -> list[str]:
+    return [p.name for p in patrons]
+
+
+def test_exact_match_ignores_case_and_spacing(index):
+    assert index.find('ann lee').name == 'Ann Lee'
+    assert index.find('  ANNABEL smith ').name == 'Annabel  Smith'
+    assert index.find('Ann') is None
+
+
+def test_prefix_of_the_name(index):
+    assert names(index.search('anna')) == ['Annabel  Smith']
+
+
+def test_start_of_any_word_comes_before_the_middle_of_a_name(index):
+    assert names(index.search('ann')) == ['Ann Lee', 'Rob Ann', 'Annabel  Smith', 'Dana Banner']
+
+
+def test_trigrams_find_any_part_of_the_name(index):
+    assert names(index.search('anne')) == ['Dana Banner']
+    assert names(index.search('b ra')) == ['Bob Ray']
+    assert index.search('xyz') == []
+
+
+def test_short_queries_only_match_prefixes(index):
+    assert names(index.search('ob')) == []
+    assert names(index.search('ro')) == ['Rob Ann']
+
+
+def test_limit(index):
+    assert len(index.search('a', limit=2)) == 2
+
+
+def test_rename_reindexes(index):
+    bob = index.get(1)
+    bob.name = 'Robert Ray'
+    index.update(bob)
+
+    assert index.find('bob ray') is None
+    assert index.find('robert ray') is bob
+    assert 'Bob Ray' not in names(index.search('bob'))
+    assert names(index.search('robe')) == ['Robert Ray']
+
+
+def test_remove(index):
+    index.remove(0)
+
+    assert index.get(0) is None
+    assert index.find('ann lee') is None
+    assert 'Ann Lee' not in names(index.search('ann'))
+    assert 'Ann Lee' not in names(index.search('n le'))
+    assert index.keys == sorted(index.keys)
+    assert all(0 not in ids for ids in index.trigrams.values())
+
+
+def test_remove_unknown_patron(index):
+    index.remove(99)
+    assert len(index.patrons) == 5
@@ -0,0 +1,41 @@
+from PyQt6.QtCore import QEvent
+
+from cart_row_template import Ui_cart_row_template
+from widget_pool import WidgetPool
+
+
+def test_released_rows_are_reused(app):
+    pool = WidgetPool(Ui_cart_row_template)
+    ui = pool.acquire()
+    pool.release(ui)
+
+    assert pool.acquire() is ui
+
+
+def test_release_beyond_max_size_deletes_the_row(app):
+    pool = WidgetPool(Ui_cart_row_template, max_size=1)
+    first, second = pool.acquire(), pool.acquire()
+    destroyed = []
+    second.widget.destroyed.connect(lambda: destroyed.append(True))
+
+    pool.release(first)
+    pool.release(second)
+    app.sendPostedEvents(None, QEvent.Type.DeferredDelete.value)
+
+    assert pool.free == [first]
+    assert destroyed
+
+
+def test_shrinking_deletes_spare_rows(app):
+    pool = WidgetPool(Ui_cart_row_template)
+    rows = [pool.acquire() for _ in range(3)]
+    destroyed = []
+    for ui in rows:
+        ui.widget.destroyed.connect(lambda: destroyed.append(True))
+        pool.release(ui)
+
+    pool.resize(1)
+    app.sendPostedEvents(None, QEvent.Type.DeferredDelete.value)
+
+    assert pool.free == rows[:1]
+    assert len(destroyed) == 2
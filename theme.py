@@ -0,0 +1,65 @@
+import colorsys
+from functools import cache
+
+from PyQt6.QtWidgets import QWidget
+
+# Patron colors are snapped to a fixed palette so they can all live in the app stylesheet, parsed once at launch,
+# instead of one stylesheet per button
+PATRON_HUES = 36
+PATRON_LIGHTNESS = 0.35, 0.5, 0.65
+PATRON_SATURATION = 0.5
+PATRON_TEXT_COLOR = '#202124'
+
+# Padding for template buttons, selected by their buttonRole dynamic property
+BUTTON_ROLE_QSS = '''
+QPushButton[buttonRole="quantity"] { padding: 10px 15px; }
+QPushButton[buttonRole="remove"] { padding: 10px 20px; }
+QPushButton[buttonRole="add_to_cart"] { padding: 20px; }
+'''
+
+# Server status badge in the corner of the main window, only shown while the backend is unreachable
+HEALTH_QSS = '''
+QLabel[healthStatus="offline"] { background-color: #c62828; color: white; padding: 6px 12px; border-radius: 12px; }
+'''
+
+# Still screen shown while the kiosk is in low power, dark so the panel draws as little as possible
+ATTRACT_QSS = '''
+QWidget#attract_page { background-color: black; }
+QLabel#attract_label { color: #9e9e9e; }
+'''
+
+
+def palette_hex(hue_index: int, lightness_index: int) -> str:
+    hue = hue_index / PATRON_HUES
+    r, g, b = colorsys.hls_to_rgb(hue, PATRON_LIGHTNESS[lightness_index], PATRON_SATURATION)
+    return f'#{round(r * 255):02x}{round(g * 255):02x}{round(b * 255):02x}'
+
+
+def additional_qss() -> str:
+    rules = [BUTTON_ROLE_QSS, HEALTH_QSS, ATTRACT_QSS]
+    for hue_index in range(PATRON_HUES):
+        for lightness_index in range(len(PATRON_LIGHTNESS)):
+            rules.append(f'QPushButton[patronColor="{hue_index}-{lightness_index}"] '
+                         f'{{ background-color: {palette_hex(hue_index, lightness_index)}; '
+                         f'color: {PATRON_TEXT_COLOR}; }}')
+    return '\n'.join(rules)
+
+
+# Palette key for a patron name, the same name always hashes to the same color
+@cache
+def patron_color(name: str) -> str:
+    from colorhash import ColorHash
+
+    hue, _, lightness = ColorHash(name).hsl
+    hue_index = round(hue / 360 * PATRON_HUES) % PATRON_HUES
+    lightness_index = min(range(len(PATRON_LIGHTNESS)), key=lambda i: abs(PATRON_LIGHTNESS[i] - lightness))
+    return f'{hue_index}-{lightness_index}'
+
+
+def set_patron_color(widget: QWidget, name: str):
+    widget.setProperty('patronColor', patron_color(name))
+
+    # Property selectors are only re-evaluated on polish, which has already happened for visible widgets
+    if widget.isVisible():
+        widget.style().unpolish(widget)
+        widget.style().polish(widget)
@@ -0,0 +1,30 @@
+from typing import BinaryIO
+
+from PyQt6.QtGui import QImage
+
+# Shrink by whole factors with reduce() until within this factor of the target, then resample the rest properly
+REDUCING_GAP = 2.0
+
+
+def fit_size(size: tuple[int, int], bounds: tuple[int, int]) -> tuple[int, int]:
+    scale = min(bounds[0] / size[0], bounds[1] / size[1])
+    return max(1, round(size[0] * scale)), max(1, round(size[1] * scale))
+
+
+# Decodes a picture straight to the size it is shown at. JPEGs are decoded at 1/2, 1/4 or 1/8 scale from the DCT
+# coefficients (draft) so the full resolution image never exists, and the pixels come out in Qt's own 32 bit layout
+def decode_thumbnail(source: BinaryIO, bounds: tuple[int, int]) -> QImage:
+    # Only needed for decoding, keep it off the startup path
+    from PIL import Image
+
+    with Image.open(source) as image:
+        image.draft('RGB', bounds)
+        size = fit_size(image.size, bounds)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info or 'A' in image.mode else 'RGB')
+        image = image.resize(size, Image.Resampling.LANCZOS, reducing_gap=REDUCING_GAP)
+
+    # QImage keeps a reference to the bytes, so the buffer is used as is
+    if image.mode == 'RGBA':
+        return QImage(image.tobytes('raw', 'BGRA'), *size, size[0] * 4, QImage.Format.Format_ARGB32)
+    return QImage(image.tobytes('raw', 'BGRX'), *size, size[0] * 4, QImage.Format.Format_RGB32)
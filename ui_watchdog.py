@@ -0,0 +1,124 @@
+import logging
+import sys
+import threading
+import time
+import traceback
+from pathlib import Path
+
+from PyQt6.QtCore import QObject, QTimer, QEvent
+from PyQt6.QtWidgets import QScroller, QWidget
+
+import metrics
+
+HEARTBEAT_INTERVAL = 50
+STALL_THRESHOLD = 0.25
+SAMPLE_INTERVAL = 0.025
+STACK_DEPTH = 12
+
+logger = logging.getLogger(__name__)
+SOURCE_ROOT = Path(__file__).resolve().parent
+# Plumbing rather than slots: timing, and the store, which delivers every view update from flush
+SKIPPED_FILES = {Path(metrics.__file__).resolve(), Path(__file__).resolve(), SOURCE_ROOT / 'store.py'}
+# Decorators (network_action, metrics.action, on_store_thread) all wrap their function in one of these
+SKIPPED_FUNCTIONS = {'<module>', 'wrapper'}
+
+
+# Name the outermost of our own functions on the stack, which is the slot Qt called into
+def slot_name(frame) -> str:
+    slot = '<event loop>'
+    while frame is not None:
+        path = Path(frame.f_code.co_filename).resolve()
+        if (path.is_relative_to(SOURCE_ROOT) and path not in SKIPPED_FILES
+                and frame.f_code.co_name not in SKIPPED_FUNCTIONS):
+            slot = frame.f_code.co_name
+        frame = frame.f_back
+    return slot
+
+
+# Heartbeat timer on the GUI thread plus a sampling thread that grabs the GUI thread's stack once a beat is overdue
+class EventLoopWatchdog(QObject):
+    def __init__(self, parent: QObject, threshold: float = STALL_THRESHOLD):
+        super().__init__(parent)
+        self.threshold = threshold
+        self.gui_thread_id = threading.get_ident()
+        self.last_beat = time.perf_counter()
+        self.stall_slot: str | None = None
+        self.stall_stack: list[str] = []
+
+        # Scrolling viewports and when each last painted
+        self.scrolling: dict[QWidget, float | None] = {}
+
+        self.heartbeat = QTimer(self)
+        self.heartbeat.timeout.connect(self.beat)
+        self.heartbeat.start(HEARTBEAT_INTERVAL)
+
+        self.running = True
+        # Cleared while paused, the sampler waits on it instead of polling
+        self.awake = threading.Event()
+        self.awake.set()
+        self.sampler = threading.Thread(target=self.sample, name='event-loop-watchdog', daemon=True)
+        self.sampler.start()
+
+    def beat(self):
+        now = time.perf_counter()
+        stall = now - self.last_beat - HEARTBEAT_INTERVAL / 1000
+        self.last_beat = now
+
+        if self.stall_slot is not None:
+            metrics.record('ui.stall', stall, slot=self.stall_slot)
+            logger.warning('GUI thread stalled for %.0f ms in %s\n%s', stall * 1000, self.stall_slot,
+                           ''.join(self.stall_stack))
+            self.stall_slot = None
+            self.stall_stack = []
+
+    def sample(self):
+        while self.running:
+            self.awake.wait()
+            time.sleep(SAMPLE_INTERVAL)
+            # Paused during the sleep, the heartbeat stopped on purpose
+            if not self.awake.is_set():
+                continue
+            overdue = time.perf_counter() - self.last_beat - HEARTBEAT_INTERVAL / 1000
+            if overdue < self.threshold or self.stall_slot is not None:
+                continue
+
+            frame = sys._current_frames().get(self.gui_thread_id)
+            if frame is not None:
+                self.stall_stack = traceback.format_stack(frame, limit=STACK_DEPTH)
+                self.stall_slot = slot_name(frame)
+
+    def stop(self):
+        self.running = False
+        self.heartbeat.stop()
+        self.awake.set()
+
+    # No heartbeat and no sampling while the kiosk is in low power
+    def pause(self):
+        self.awake.clear()
+        self.heartbeat.stop()
+
+    def resume(self):
+        self.last_beat = time.perf_counter()
+        self.heartbeat.start(HEARTBEAT_INTERVAL)
+        self.awake.set()
+
+    # Record paint intervals on a kinetic scrolling viewport while the scroller is moving
+    def watch_scrolling(self, viewport: QWidget):
+        scroller = QScroller.scroller(viewport)
+        scroller.stateChanged.connect(lambda state: self.scroll_state_changed(viewport, state))
+        viewport.installEventFilter(self)
+
+    def scroll_state_changed(self, viewport: QWidget, state: QScroller.State):
+        if state == QScroller.State.Scrolling:
+            self.scrolling[viewport] = None
+        else:
+            self.scrolling.pop(viewport, None)
+
+    def eventFilter(self, watched: QObject, event: QEvent) -> bool:
+        if event.type() == QEvent.Type.Paint and watched in self.scrolling:
+            now = time.perf_counter()
+            last_paint = self.scrolling[watched]
+            if last_paint is not None:
+                metrics.record('ui.scroll_frame', now - last_paint, viewport=watched.objectName())
+            self.scrolling[watched] = now
+        return False
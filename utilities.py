@@ -11,6 +11,13 @@ def resource_path(relative_path: str):
     return base_path / relative_path
 
 
+# Get absolute path of a writable per-user file (metrics, cached state, ...)
+def data_path(relative_path: str):
+    base_path = Path.home() / '.house-party-pos'
+    base_path.mkdir(parents=True, exist_ok=True)
+    return base_path / relative_path
+
+
 # Custom QLabel with mouse click event
 class ClickableLabel(QLabel):
     clicked = pyqtSignal()
@@ -0,0 +1,47 @@
+from PyQt6.QtWidgets import QWidget, QPushButton
+
+DEFAULT_POOL_SIZE = 32
+
+
+# Recycles widgets built from a uic template so rows don't have to be set up from scratch every time
+class WidgetPool:
+    def __init__(self, ui_class: type, max_size: int = DEFAULT_POOL_SIZE):
+        self.ui_class = ui_class
+        self.max_size = max_size
+        self.free = []
+
+    # Returns a template ui with its root widget attached as ui.widget, the widget is hidden until shown by the caller
+    def acquire(self):
+        if self.free:
+            return self.free.pop()
+
+        widget = QWidget()
+        ui = self.ui_class()
+        ui.setupUi(widget)
+        ui.widget = widget
+        return ui
+
+    def release(self, ui):
+        widget = ui.widget
+        widget.hide()
+
+        # Drop connections to the previously bound item
+        for button in widget.findChildren(QPushButton):
+            try:
+                button.clicked.disconnect()
+            except TypeError:
+                pass
+
+        if len(self.free) < self.max_size:
+            self.free.append(ui)
+        else:
+            widget.setParent(None)
+            widget.deleteLater()
+
+    # Spare widgets beyond the new size are deleted straight away
+    def resize(self, max_size: int):
+        self.max_size = max_size
+        while len(self.free) > self.max_size:
+            widget = self.free.pop().widget
+            widget.setParent(None)
+            widget.deleteLater()